@@ -0,0 +1,57 @@
+import argparse
+import sys
+from constants import DATABASE, SNAPSHOT_DIRECTORY
+from functions.analytics_helpers import export_snapshot, prune_exports, benchmark_export
+from functions.snapshot_helpers import list_snapshots, is_live_snapshot
+
+
+def export(args):
+    live = [snapshot_path for snapshot_path in list_snapshots(args.snapshot_directory)
+            if is_live_snapshot(snapshot_path, args.database)]
+    if not live:
+        sys.exit("The database being served is not a snapshot. Download the dataset again to export it.")
+
+    if export_snapshot(live[0]) is None:
+        sys.exit("Exports require pyarrow. Install it with `pip install pyarrow`")
+
+    prune_exports(snapshot_directory=args.snapshot_directory)
+    print(f"Exported {live[0]}")
+
+
+def benchmark(args):
+    try:
+        results = benchmark_export(args.database)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    print(f"{'Table':<15}{'SQLite (s)':>12}{'Export (s)':>12}{'SQLite (MB)':>13}{'Export (MB)':>13}")
+    for table_name, result in results["tables"].items():
+        sqlite_mb = "n/a" if result["sqlite_bytes"] is None else f"{result['sqlite_bytes'] / 1048576:.1f}"
+        print(f"{table_name:<15}{result['sqlite_seconds']:>12.3f}{result['export_seconds']:>12.3f}"
+              f"{sqlite_mb:>13}{result['export_bytes'] / 1048576:>13.1f}")
+    print(f"Whole database file: {results['database_bytes'] / 1048576:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the served database's tables for analysis, or compare loading them from each format.")
+    parser.add_argument("--database", default=DATABASE,
+                        help="Path to the live titles/owners database")
+    parser.add_argument("--snapshot-directory", default=SNAPSHOT_DIRECTORY,
+                        help="Directory holding the snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Write the columnar export of the database being served")
+    export_parser.set_defaults(handler=export)
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="Time loading each table into pandas from SQLite and from the export")
+    benchmark_parser.set_defaults(handler=benchmark)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,40 @@
-import shutil
-from flask import Flask, render_template, request, send_file
+import secrets
+from urllib.parse import quote
+from flask import Flask, Response, jsonify, redirect, render_template, request, send_file, stream_with_context, url_for
+from werkzeug.http import dump_options_header
 from datetime import datetime
-from functions.download_dataset_helpers import convert_month_to_number, validate_inputs, process_dataset_download, finalize_data_processing, cleanup_temp
-from constants import DATASETS_COLUMNS, DATABASE, OUTPUT_FILE_DIRECTORY
-from functions.company_search_helpers import get_owner_info, get_titles_for_company, format_titles, format_incorporation_info
-from functions.title_search_helpers import get_title_info, format_title_info, get_owners_for_title_number, get_owners_from_raw_owner_info
-from functions.export_results_helpers import reset, export_result_as_files, find_file_by_extension, export_title_search_result_as_files
+from functions.download_dataset_helpers import convert_month_to_number, validate_inputs, download_datasets, finalize_data_processing, cleanup_temp
+from functions.normalise_helpers import get_owner_key
+from constants import DATABASE, OUTPUT_FILE_DIRECTORY, OWNER_SUGGESTIONS_LIMIT, OWNER_SUGGESTIONS_MAX_LIMIT, TEMP_DIRECTORY, COMPANY_RESULTS_PAGE_SIZE, COMPANY_RESULTS_MAX_PAGE_SIZE, FULL_TEXT_SEARCH_LIMIT, FULL_TEXT_SEARCH_MAX_LIMIT, CO_OWNERS_LIMIT, CO_OWNERS_MAX_LIMIT, OWNER_NETWORK_MAX_HOPS, POSTCODE_OWNERS_LIMIT, POSTCODE_RESULTS_PAGE_SIZE, POSTCODE_RESULTS_MAX_PAGE_SIZE, STATISTICS_TOP_OWNERS_LIMIT, STATISTICS_TOP_OWNERS_MAX_LIMIT, EXPORT_CACHE_MAX_BYTES, EXPORT_TTL_SECONDS, EXPORT_JANITOR_INTERVAL_SECONDS, EXPORT_TOKEN_TTL_SECONDS, SECRET_KEY
+from functions.company_search_helpers import get_company_info, get_owner_info, get_owner_summary, get_owner_id, get_owners_by_id, get_titles_page, iter_titles_for_company, format_titles, format_incorporation_info, format_price, parse_owner_names, get_titles_for_companies
+from functions.title_search_helpers import get_title_info, format_title_info, get_owners_for_title_number, get_owners_from_raw_owner_info, parse_title_numbers, get_titles_with_owners, format_owner_country
+from functions.export_results_helpers import get_export_path, create_export_token, check_export_token, open_cached_export, write_export, start_export_janitor, create_pdf, create_titles_result_pdf, iter_company_search_csv, iter_title_search_csv, iter_bulk_title_results, iter_bulk_company_results, parquet_available
+from functions.database_helpers import get_dataset_version
+from functions.result_cache_helpers import cached_result, get_result_cache_stats
+from functions.owner_suggest_helpers import get_owner_index, suggest_owners
+from functions.owner_graph_helpers import get_owner_graph, is_owner, get_co_owners, get_group, get_network
+from functions.full_text_search_helpers import search_owners, search_addresses
+from functions.history_helpers import parse_month, format_month, get_releases, get_title_owners_at, get_title_history, get_owner_changes
+from functions.job_helpers import submit_job, start_stage, update_progress, check_cancelled, cancel_job, get_job
+from functions.statistics_helpers import get_source_stats, get_country_stats, get_top_owners
+from functions.postcode_search_helpers import parse_postcode_prefix, count_postcode_titles, get_postcode_owners, get_postcode_titles_page
 
 
 app = Flask(__name__)
 
+# Without a configured key, export links only work in the process that issued them
+app.secret_key = SECRET_KEY or secrets.token_hex(32)
+
+# Expired and excess exports are removed in the background, not mid-request
+start_export_janitor(OUTPUT_FILE_DIRECTORY, EXPORT_TTL_SECONDS,
+                     EXPORT_CACHE_MAX_BYTES, EXPORT_JANITOR_INTERVAL_SECONDS)
+
+BULK_EXPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
 
 @app.route("/")
 def index():
@@ -21,15 +46,36 @@ def about():
     return render_template("about.html")
 
 
+def run_download_job(job, api_key, download_option, input_year, converted_month):
+    """Download the datasets and build and serve a new database, reporting each stage on the job."""
+    temp_dir = TEMP_DIRECTORY
+    cleanup_temp(temp_dir)
+
+    try:
+        start_stage(job, "download")
+        error, datasets = download_datasets(
+            api_key, download_option, input_year, converted_month,
+            lambda dataset, downloaded, total: update_progress(job, dataset, downloaded, total))
+
+        # A cancelled download is reported as a download error
+        check_cancelled(job)
+        if error:
+            raise ValueError(error)
+
+        finalize_data_processing(
+            download_option, datasets, lambda stage: start_stage(job, stage),
+            lambda titles: update_progress(job, "titles", titles, None))
+    finally:
+        cleanup_temp(temp_dir)
+
+
 @app.route("/download_dataset", methods=["GET", "POST"])
 def download_dataset():
-    temp_dir = "instance/temp"
     current_year = datetime.now().year
     current_month_start = datetime(
         datetime.now().year, datetime.now().month, 1)
 
     if request.method == "POST":
-        cleanup_temp(temp_dir)
         api_key = request.form.get("api_key")
         download_option = request.form.get("download_option")
 
@@ -43,24 +89,83 @@ def download_dataset():
         if validation_error:
             return render_template("error.html", message=validation_error, retry_url="download_dataset")
 
-        for dataset in DATASETS_COLUMNS:
-            error = process_dataset_download(
-                api_key, download_option, dataset, input_year, converted_month)
-            if error:
-                return render_template("error.html", message=error, retry_url="download_dataset")
-
-        # Finalize data processing
-        try:
-            finalize_data_processing()
-            shutil.rmtree("instance/temp")
-            return render_template("download_success.html")
-        except Exception as e:
-            cleanup_temp(temp_dir)
-            return render_template("error.html", message=e, retry_url="download_dataset")
+        # The download runs in the background; the status page follows it
+        job_id = submit_job(f"{download_option.capitalize()} download", run_download_job,
+                            api_key, download_option, input_year, converted_month)
+        return redirect(url_for("download_status", job_id=job_id))
 
     return render_template("download_dataset.html", current_year=current_year)
 
 
+@app.route("/download_dataset/<job_id>")
+def download_status(job_id):
+    if get_job(job_id) is None:
+        return render_template("error.html", message="Error: Download not found", retry_url="download_dataset")
+
+    return render_template("download_status.html", job_id=job_id)
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+
+    return jsonify(job)
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+
+    return jsonify(job)
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    return jsonify(get_result_cache_stats())
+
+
+def normalise_query(query):
+    """Collapse the whitespace in a search, so equivalent searches share cached results."""
+    return " ".join(query.split())
+
+
+def run_owner_summary(company):
+    """Return the stored name, country, source and title count of the owner a search finds, or None."""
+    return cached_result(DATABASE, "owner", get_owner_key(company), lambda: get_owner_summary(DATABASE, company))
+
+
+def run_company_search(company):
+    """Return the incorporation statement, result count and titles for a company, or None."""
+    owner_summary = run_owner_summary(company)
+    if not owner_summary:
+        return None
+
+    owner = owner_summary[0]
+    return cached_result(DATABASE, "company", owner, lambda: get_company_search(owner))
+
+
+def get_company_search(company):
+    """Look up and format the full results of a company search, or None."""
+    company_details, properties = get_company_info(DATABASE, company)
+
+    if not company_details:
+        return None
+
+    incorporation_statement = format_incorporation_info(
+        company, company_details)
+
+    titles = format_titles(properties)
+
+    number_of_properties = f"{
+        len(titles)} results"
+
+    return incorporation_statement, number_of_properties, titles
+
+
 @app.route("/company_search", methods=["GET", "POST"])
 def company_search():
     if request.method == "POST":
@@ -69,29 +174,180 @@ def company_search():
         if not company:
             return render_template("company_search_result.html", owner=company, incorporation_statement=None, titles=None, number_of_properties=None)
 
-        company_details = get_owner_info(DATABASE, company)
+        owner_summary = run_owner_summary(company)
 
-        if not company_details:
-            return render_template("company_search_result.html", owner=company, incorporation_statement=None, titles=None, number_of_properties=None)
+        if not owner_summary:
+            # Offer the closest owner names instead
+            matches = run_owners_search(company, FULL_TEXT_SEARCH_LIMIT)
+            return render_template("company_search_result.html", owner=company, incorporation_statement=None, titles=None, number_of_properties=None, matches=matches)
 
-        reset(OUTPUT_FILE_DIRECTORY)
+        # Results are shown under the owner's name as stored, however it was typed
+        owner, country, source, title_count = owner_summary
+        incorporation_statement = format_incorporation_info(
+            owner, [(country, source)])
+        number_of_properties = f"{title_count:,} results"
 
-        properties = get_titles_for_company(DATABASE, company)
+        # Only the first page is rendered; the rest is loaded as the user scrolls
+        titles, next_after = run_company_titles_page(
+            owner, 0, COMPANY_RESULTS_PAGE_SIZE)
 
-        incorporation_statement = format_incorporation_info(
-            company, company_details)
+        # Exports are generated when they are downloaded, not here
+        export_token = create_export_token(app.secret_key, "company", owner)
+        return render_template("company_search_result.html", owner=owner, incorporation_statement=incorporation_statement, number_of_properties=number_of_properties, titles=titles, next_after=next_after, export_token=export_token)
 
-        titles = format_titles(properties)
+    return render_template("company_search.html")
 
-        number_of_properties = f"{
-            len(titles)} results"
 
-        export_result_as_files(company, incorporation_statement,
-                               number_of_properties, titles, OUTPUT_FILE_DIRECTORY)
+def run_company_titles_page(company, after_title_id, limit):
+    """Return a page of a company's formatted titles, and the title ID the next page starts after."""
+    def get_page():
+        properties, next_after = get_titles_page(
+            DATABASE, company, after_title_id, limit)
+        return format_titles(properties), next_after
 
-        return render_template("company_search_result.html", incorporation_statement=incorporation_statement, number_of_properties=number_of_properties, titles=titles)
+    return cached_result(DATABASE, "company_titles", (get_owner_key(company), after_title_id, limit), get_page)
 
-    return render_template("company_search.html")
+
+@app.route("/api/companies/titles")
+def company_titles():
+    company = request.args.get("owner", "")
+    after = request.args.get("after", 0, type=int)
+    limit = request.args.get("limit", COMPANY_RESULTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, COMPANY_RESULTS_MAX_PAGE_SIZE))
+
+    titles, next_after = run_company_titles_page(company, after, limit)
+
+    return jsonify(owner=company, titles=titles, next_after=next_after)
+
+
+@app.route("/api/owners/suggest")
+def owners_suggest():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", OWNER_SUGGESTIONS_LIMIT, type=int)
+    limit = max(1, min(limit, OWNER_SUGGESTIONS_MAX_LIMIT))
+
+    owner_index = get_owner_index(DATABASE)
+    suggestions = suggest_owners(owner_index, query, limit)
+
+    return jsonify(query=query, suggestions=suggestions)
+
+
+def run_owners_search(query, limit):
+    """Return the owners best matching a search, from the cache if it was run recently."""
+    query = normalise_query(query).upper()
+    return cached_result(DATABASE, "owners_search", (query, limit), lambda: search_owners(DATABASE, query, limit))
+
+
+@app.route("/api/owners/search")
+def owners_search():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", FULL_TEXT_SEARCH_LIMIT, type=int)
+    limit = max(1, min(limit, FULL_TEXT_SEARCH_MAX_LIMIT))
+
+    return jsonify(query=query, owners=run_owners_search(query, limit))
+
+
+def find_graph_owner(company):
+    """Return the co-ownership graph, the ID of the owner a search finds and an error response, if any."""
+    graph = get_owner_graph(DATABASE)
+    if graph is None:
+        return None, None, (jsonify(error="The co-ownership graph has not been built. Download the dataset again to build it."), 404)
+
+    owner_id = get_owner_id(DATABASE, company) if company else None
+    if owner_id is None or not is_owner(graph, owner_id):
+        return None, None, (jsonify(error="No owner was found with that name."), 404)
+
+    return graph, owner_id, None
+
+
+def get_graph_limit():
+    """Read the `limit` argument of a co-ownership query, within bounds."""
+    limit = request.args.get("limit", CO_OWNERS_LIMIT, type=int)
+    return max(1, min(limit, CO_OWNERS_MAX_LIMIT))
+
+
+@app.route("/api/owners/co-owners")
+def co_owners():
+    company = request.args.get("owner", "")
+    graph, owner_id, error = find_graph_owner(company)
+    if error:
+        return error
+
+    co_owner_count, co_owner_ids = get_co_owners(graph, owner_id, get_graph_limit())
+    owners = get_owners_by_id(DATABASE, [co_owner_id for co_owner_id, _ in co_owner_ids])
+    co_owners = [{**owners[co_owner_id], "shared_titles": shared_titles}
+                 for co_owner_id, shared_titles in co_owner_ids if co_owner_id in owners]
+
+    return jsonify(owner=company, co_owner_count=co_owner_count, co_owners=co_owners)
+
+
+@app.route("/api/owners/group")
+def owner_group():
+    company = request.args.get("owner", "")
+    graph, owner_id, error = find_graph_owner(company)
+    if error:
+        return error
+
+    # The group includes the owner itself, so an owner with no co-owners is a group of one
+    size, member_ids = get_group(graph, owner_id, get_graph_limit())
+    owners = get_owners_by_id(DATABASE, member_ids)
+    members = [owners[member_id] for member_id in member_ids if member_id in owners]
+
+    return jsonify(owner=company, size=size, owners=members)
+
+
+@app.route("/api/owners/network")
+def owner_network():
+    company = request.args.get("owner", "")
+    hops = request.args.get("hops", 2, type=int)
+    if hops is None or not 1 <= hops <= OWNER_NETWORK_MAX_HOPS:
+        return jsonify(error=f"Hops must be between 1 and {OWNER_NETWORK_MAX_HOPS}."), 400
+
+    graph, owner_id, error = find_graph_owner(company)
+    if error:
+        return error
+
+    counts, reached = get_network(graph, owner_id, hops, get_graph_limit())
+    owners = get_owners_by_id(DATABASE, [found_id for found_id, _ in reached])
+    network = [{**owners[found_id], "hops": hop}
+               for found_id, hop in reached if found_id in owners]
+
+    return jsonify(owner=company, hops=hops, counts=counts, owners=network)
+
+
+@app.route("/api/titles/search")
+def addresses_search():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", FULL_TEXT_SEARCH_LIMIT, type=int)
+    limit = max(1, min(limit, FULL_TEXT_SEARCH_MAX_LIMIT))
+
+    # Address matching ignores case, so searches differing only in case share a result
+    normalised_query = normalise_query(query).upper()
+    titles = cached_result(DATABASE, "addresses_search", (normalised_query, limit),
+                           lambda: search_addresses(DATABASE, normalised_query, limit))
+
+    return jsonify(query=query, titles=titles)
+
+
+def run_title_search(title_number):
+    """Return the formatted details and owners of a title, or None."""
+    title_number = title_number.strip().upper()
+    return cached_result(DATABASE, "title", title_number, lambda: get_title_search(title_number))
+
+
+def get_title_search(title_number):
+    """Look up and format the details and owners of a title, or None."""
+    raw_title_details = get_title_info(DATABASE, title_number)
+
+    if not raw_title_details:
+        return None
+
+    formatted_title_details = format_title_info(
+        title_number, raw_title_details)
+    raw_owner_info = get_owners_for_title_number(DATABASE, title_number)
+    owners = get_owners_from_raw_owner_info(raw_owner_info)
+
+    return formatted_title_details, owners
 
 
 @app.route("/title_search", methods=["GET", "POST"])
@@ -103,44 +359,327 @@ def title_search():
             return render_template("error.html", message="Missing title number.", retry_url="title_search")
 
         # Fetch title details
-        raw_title_details = get_title_info(DATABASE, title_number)
-        formatted_title_details = None
-        owners = []
-
-        # Process title details if available
-        if raw_title_details:
-            formatted_title_details = format_title_info(
-                title_number, raw_title_details)
-            raw_owner_info = get_owners_for_title_number(
-                DATABASE, title_number)
-            owners = get_owners_from_raw_owner_info(raw_owner_info)
-
-            # Reset output files and export search results
-            reset(OUTPUT_FILE_DIRECTORY)
-            export_title_search_result_as_files(
-                title_number, formatted_title_details, owners, OUTPUT_FILE_DIRECTORY)
+        formatted_title_details, owners = run_title_search(
+            title_number) or (None, [])
 
         return render_template(
             "title_search_result.html",
             title_number=title_number,
             address=formatted_title_details["address"] if formatted_title_details else None,
             price=formatted_title_details["price"] if formatted_title_details else None,
-            owners=owners
+            owners=owners,
+            export_token=create_export_token(
+                app.secret_key, "title", title_number)
         )
 
     return render_template("title_search.html")
 
 
+def get_postcode_summary(prefix):
+    """Count the titles under a postcode prefix and find the owners holding the most of them."""
+    number_of_titles = count_postcode_titles(DATABASE, prefix)
+    owners = [{"company": owner, "country": format_owner_country(country, source), "title_count": title_count}
+              for owner, country, source, title_count in get_postcode_owners(DATABASE, prefix, POSTCODE_OWNERS_LIMIT)]
+
+    return number_of_titles, owners
+
+
+def run_postcode_titles_page(prefix, after_postcode, after_title_id, limit):
+    """Return a page of titles with their owners for a postcode prefix, and where the next page starts."""
+    title_numbers, next_after = get_postcode_titles_page(
+        DATABASE, prefix, after_postcode, after_title_id, limit)
+
+    titles = [{**title, "price": format_price(title["price"])}
+              for title in get_titles_with_owners(DATABASE, title_numbers)]
+
+    if next_after:
+        next_after = {"postcode": next_after[0], "title_id": next_after[1]}
+
+    return titles, next_after
+
+
+@app.route("/postcode_search", methods=["GET", "POST"])
+def postcode_search():
+    if request.method == "POST":
+        query = request.form.get("query", "")
+        prefix = parse_postcode_prefix(query)
+
+        if not prefix:
+            return render_template("error.html", message="Enter a postcode, or the start of one such as SW1A or SW1A 1.", retry_url="postcode_search")
+
+        number_of_titles, owners = cached_result(
+            DATABASE, "postcode", prefix, lambda: get_postcode_summary(prefix))
+
+        # Only the first page of titles is rendered; the rest is loaded as the user scrolls
+        titles, next_after = run_postcode_titles_page(
+            prefix, "", 0, POSTCODE_RESULTS_PAGE_SIZE)
+
+        return render_template("postcode_search_result.html", postcode=prefix, number_of_titles=f"{number_of_titles:,} results", owners=owners, titles=titles, next_after=next_after)
+
+    return render_template("postcode_search.html")
+
+
+@app.route("/api/titles/postcode")
+def postcode_titles():
+    prefix = parse_postcode_prefix(request.args.get("q", ""))
+    if not prefix:
+        return jsonify(error="Enter a postcode, or the start of one."), 400
+
+    after_postcode = request.args.get("after_postcode", "")
+    after = request.args.get("after", 0, type=int)
+    limit = request.args.get("limit", POSTCODE_RESULTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, POSTCODE_RESULTS_MAX_PAGE_SIZE))
+
+    titles, next_after = run_postcode_titles_page(
+        prefix, after_postcode, after, limit)
+
+    return jsonify(postcode=prefix, titles=titles, next_after=next_after)
+
+
+def get_statistics(limit):
+    """Read the summary statistics and the `limit` largest owners, or None if they have not been built."""
+    sources = get_source_stats(DATABASE)
+    if sources is None:
+        return None
+
+    top_owners = {
+        order_by: [{"owner": owner, "country": format_owner_country(country, source), "source": source,
+                    "title_count": title_count, "priced_title_count": priced_title_count, "total_price": total_price}
+                   for owner, country, source, title_count, priced_title_count, total_price in get_top_owners(DATABASE, order_by, limit)]
+        for order_by in ("title_count", "total_price")
+    }
+
+    return {
+        "sources": [{"source": source, "owner_count": owner_count, "title_count": title_count, "total_price": total_price}
+                    for source, owner_count, title_count, total_price in sources],
+        "countries": [{"country": format_owner_country(country, source), "source": source, "owner_count": owner_count,
+                       "title_count": title_count, "total_price": total_price}
+                      for country, source, owner_count, title_count, total_price in get_country_stats(DATABASE)],
+        "top_owners_by_titles": top_owners["title_count"],
+        "top_owners_by_price": top_owners["total_price"]
+    }
+
+
+def run_statistics(limit):
+    """Return the summary statistics, from the cache if they were read recently."""
+    return cached_result(DATABASE, "statistics", limit, lambda: get_statistics(limit))
+
+
+@app.route("/statistics")
+def statistics():
+    statistics = run_statistics(STATISTICS_TOP_OWNERS_LIMIT)
+    if statistics is None:
+        return render_template("error.html", message="Statistics have not been built for this database. Download the dataset again to build them.", retry_url="download_dataset")
+
+    return render_template("statistics.html", **statistics)
+
+
+@app.route("/api/statistics")
+def statistics_api():
+    limit = request.args.get("limit", STATISTICS_TOP_OWNERS_LIMIT, type=int)
+    limit = max(1, min(limit, STATISTICS_TOP_OWNERS_MAX_LIMIT))
+
+    statistics = run_statistics(limit)
+    if statistics is None:
+        return jsonify(error="Statistics have not been built for this database. Download the dataset again to build them."), 404
+
+    return jsonify(**statistics)
+
+
+@app.route("/api/history/titles/<title_number>")
+def title_history(title_number):
+    if not get_releases():
+        return jsonify(error="No releases have been recorded in the history yet."), 404
+
+    title_number = title_number.upper()
+    month_text = request.args.get("month")
+    if month_text is None:
+        return jsonify(title_number=title_number, owners=get_title_history(title_number))
+
+    month = parse_month(month_text)
+    if month is None:
+        return jsonify(error="Month must be in the form YYYY-MM."), 400
+
+    return jsonify(title_number=title_number, month=month_text, owners=get_title_owners_at(title_number, month))
+
+
+@app.route("/api/history/owners")
+def owner_history():
+    releases = get_releases()
+    if not releases:
+        return jsonify(error="No releases have been recorded in the history yet."), 404
+
+    owner = request.args.get("owner", "")
+    # Default to every recorded release
+    start_month = parse_month(request.args.get("from", format_month(releases[0])))
+    end_month = parse_month(request.args.get("to", format_month(releases[-1])))
+    if not owner or start_month is None or end_month is None:
+        return jsonify(error="Give an owner, and months in the form YYYY-MM."), 400
+
+    changes = get_owner_changes(owner, start_month, end_month)
+    if changes is None:
+        return jsonify(error="The history was recorded before owner lookups were supported. Download a dataset to update it."), 404
+
+    return jsonify(owner=owner, changes=changes)
+
+
+@app.route("/api/titles/bulk", methods=["POST"])
+def bulk_title_search():
+    # Accept a JSON list, pasted text, or an uploaded CSV
+    payload = request.get_json(silent=True)
+    if payload is not None and not isinstance(payload, dict):
+        return jsonify(error="The JSON body must be an object."), 400
+    payload = payload or {}
+    if payload.get("title_numbers"):
+        text = "\n".join(str(title_number)
+                         for title_number in payload["title_numbers"])
+    elif request.files.get("file"):
+        text = request.files["file"].read().decode("utf-8-sig")
+    else:
+        text = request.form.get("title_numbers", "")
+
+    title_numbers = parse_title_numbers(text)
+    if not title_numbers:
+        return jsonify(error="Missing title numbers."), 400
+
+    output_format = request.args.get(
+        "format", request.form.get("format", "csv"))
+    if output_format not in ("csv", "ndjson"):
+        return jsonify(error="Format must be csv or ndjson."), 400
+
+    results = get_titles_with_owners(DATABASE, title_numbers)
+
+    return Response(
+        stream_with_context(iter_bulk_title_results(results, output_format)),
+        mimetype=BULK_EXPORT_MIMETYPES[output_format],
+        headers={
+            "Content-Disposition": f"attachment; filename=title_search_results.{output_format}"}
+    )
+
+
+@app.route("/api/companies/bulk", methods=["POST"])
+def bulk_company_search():
+    # Accept a JSON list, pasted text, or an uploaded CSV
+    payload = request.get_json(silent=True)
+    if payload is not None and not isinstance(payload, dict):
+        return jsonify(error="The JSON body must be an object."), 400
+    payload = payload or {}
+    if payload.get("owners"):
+        text = "\n".join(str(owner) for owner in payload["owners"])
+    elif request.files.get("file"):
+        text = request.files["file"].read().decode("utf-8-sig")
+    else:
+        text = request.form.get("owners", "")
+
+    owner_names = parse_owner_names(text)
+    if not owner_names:
+        return jsonify(error="Missing company names."), 400
+
+    output_format = request.args.get(
+        "format", request.form.get("format", "csv"))
+    if output_format not in BULK_EXPORT_MIMETYPES:
+        return jsonify(error="Format must be csv, ndjson or parquet."), 400
+    if output_format == "parquet" and not parquet_available():
+        return jsonify(error="Parquet export requires pyarrow to be installed."), 400
+
+    results = get_titles_for_companies(DATABASE, owner_names)
+
+    return Response(
+        stream_with_context(iter_bulk_company_results(results, output_format)),
+        mimetype=BULK_EXPORT_MIMETYPES[output_format],
+        headers={
+            "Content-Disposition": f"attachment; filename=company_search_results.{output_format}"}
+    )
+
+
+def create_pdf_export(search_type, query, file_path):
+    """Run a search, write its PDF export to file_path and return it opened, or return None."""
+    if search_type == "company":
+        result = run_company_search(query)
+        if not result:
+            return None
+        incorporation_statement, number_of_properties, titles = result
+
+        return write_export(file_path, lambda path: create_pdf(
+            query, incorporation_statement, number_of_properties, titles, path))
+
+    result = run_title_search(query)
+    if not result:
+        return None
+    formatted_title_details, owners = result
+
+    return write_export(file_path, lambda path: create_titles_result_pdf(
+        query, formatted_title_details, owners, path))
+
+
+def get_export_search():
+    """Read the search to export from the query string."""
+    search_type = request.args.get("search")
+    query = request.args.get("query")
+    retry_url = "title_search" if search_type == "title" else "company_search"
+
+    if search_type not in ("company", "title") or not query:
+        return None, None, retry_url
+
+    return search_type, query, retry_url
+
+
+def attachment_headers(download_name):
+    """Build a Content-Disposition header, falling back to ASCII for older clients."""
+    options = {"filename": download_name.encode(
+        "ascii", "replace").decode("ascii")}
+    if options["filename"] != download_name:
+        options["filename*"] = f"UTF-8''{quote(download_name)}"
+
+    return {"Content-Disposition": dump_options_header("attachment", options)}
+
+
 @app.route("/download_pdf")
 def download_pdf():
-    pdf_file_path = find_file_by_extension(OUTPUT_FILE_DIRECTORY, ".pdf")
-    return send_file(pdf_file_path, as_attachment=True)
+    search_type, query, retry_url = get_export_search()
+    if not search_type:
+        return render_template("error.html", message="Missing search to export.", retry_url=retry_url)
+
+    # Only the search a link was issued for can be exported with it
+    if not check_export_token(app.secret_key, request.args.get("token"), search_type, query, EXPORT_TOKEN_TTL_SECONDS):
+        return render_template("error.html", message="This export link has expired. Search again to export the results.", retry_url=retry_url), 403
+
+    # Exports are cached by query and dataset version, so repeats are instant
+    file_path = get_export_path(search_type, query, get_dataset_version(
+        DATABASE), ".pdf", OUTPUT_FILE_DIRECTORY)
+
+    export_file = open_cached_export(file_path) or create_pdf_export(
+        search_type, query, file_path)
+    if export_file is None:
+        return render_template("error.html", message=f"No search results for \"{query}\".", retry_url=retry_url)
+
+    return send_file(export_file, as_attachment=True, download_name=f"{query}.pdf")
 
 
 @app.route("/download_csv")
 def download_csv():
-    csv_file_path = find_file_by_extension(OUTPUT_FILE_DIRECTORY, ".csv")
-    return send_file(csv_file_path, as_attachment=True)
+    search_type, query, retry_url = get_export_search()
+    if not search_type:
+        return render_template("error.html", message="Missing search to export.", retry_url=retry_url)
+
+    # Only the search a link was issued for can be exported with it
+    if not check_export_token(app.secret_key, request.args.get("token"), search_type, query, EXPORT_TOKEN_TTL_SECONDS):
+        return render_template("error.html", message="This export link has expired. Search again to export the results.", retry_url=retry_url), 403
+
+    # CSVs are streamed from the cursor as they are written, without a file
+    if search_type == "company":
+        if not get_owner_info(DATABASE, query):
+            return render_template("error.html", message=f"No search results for \"{query}\".", retry_url=retry_url)
+        csv_chunks = iter_company_search_csv(
+            iter_titles_for_company(DATABASE, query))
+    else:
+        result = run_title_search(query)
+        if not result:
+            return render_template("error.html", message=f"No search results for \"{query}\".", retry_url=retry_url)
+        csv_chunks = iter_title_search_csv(result[1])
+
+    return Response(stream_with_context(csv_chunks), mimetype="text/csv",
+                    headers=attachment_headers(f"{query}.csv"))
 
 
 if __name__ == "__main__":
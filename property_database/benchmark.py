@@ -0,0 +1,281 @@
+import argparse
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from functions.company_search_helpers import iter_titles_for_company, format_titles
+from functions.download_dataset_helpers import clean_owner_columns, save_tables
+from functions.normalise_helpers import clean_owner_data, get_owner_key
+from functions.export_results_helpers import iter_company_search_csv
+from functions.title_search_helpers import get_title_info
+
+
+OWNER_COLUMNS = [f"Proprietor Name ({i})" for i in range(1, 5)]
+
+OWNER_WORDS = ["Acme", "HOLDINGS", "property", "Investments", "ESTATES", "Trust", "Capital",
+               "(Jersey)", "nominees", "&", "Co.", "GROUP", "Land", "Homes", "Overseas"]
+OWNER_SUFFIXES = ["LTD", "Ltd", "ltd.", "LIMITED", "PLC", "S.A.R.L.", "Inc", "LLP"]
+
+
+def make_owner_names(count, seed=0):
+    """Return `count` distinct synthetic owner names, with the spacing, case and punctuation of real ones."""
+    rng = np.random.default_rng(seed)
+    names = [f"{' '.join(rng.choice(OWNER_WORDS, rng.integers(1, 4)))}{'  ' if i % 5 == 0 else ' '}"
+             f"{i} {rng.choice(OWNER_SUFFIXES)}{' *' if i % 7 == 0 else ''}"
+             for i in range(count)]
+    return np.array(names, dtype=object)
+
+
+def make_tables(title_count, owner_count, seed=0):
+    """Return synthetic titles, owners and titles_owners tables shaped like a built release.
+
+    Most titles have one owner and a few have up to four, and a few owners
+    hold most of the titles.
+    """
+    rng = np.random.default_rng(seed)
+    title_ids = np.arange(1, title_count + 1)
+    postcodes = [f"SW{i % 20 + 1} {i % 9 + 1}A{chr(65 + i % 26)}" for i in range(title_count)]
+    titles = pd.DataFrame({
+        "title_id": title_ids,
+        "title_number": [f"TN{i:08d}" for i in title_ids],
+        "address": [f"{i} HIGH STREET, LONDON ({postcode})" for i, postcode in zip(title_ids, postcodes)],
+        "price": np.where(rng.random(title_count) < 0.3, np.nan, rng.integers(10000, 5000000, title_count)),
+        "postcode": postcodes
+    })
+
+    owner_names = make_owner_names(owner_count, seed)
+    owners_per_title = rng.choice([1, 2, 3, 4], title_count, p=[0.85, 0.1, 0.03, 0.02])
+    links = pd.DataFrame({
+        "owner_id": np.minimum(rng.zipf(1.5, owners_per_title.sum()), owner_count),
+        "title_id": np.repeat(title_ids, owners_per_title)
+    }).drop_duplicates()
+
+    owners = pd.DataFrame({
+        "owner_id": np.arange(1, owner_count + 1),
+        "owner": owner_names,
+        "owner_key": [get_owner_key(owner) for owner in owner_names],
+        "country": rng.choice(["JERSEY", "GUERNSEY", "BRITISH VIRGIN ISLANDS", None], owner_count),
+        "source": rng.choice(["OCOD", "CCOD"], owner_count),
+        "title_count": np.bincount(links["owner_id"], minlength=owner_count + 1)[1:]
+    })
+    return {"titles": titles, "owners": owners, "titles_owners": links}
+
+
+# The indexes as they were before bulk loading
+TO_SQL_INDEXES = {
+    "owners": [
+        "CREATE INDEX IF NOT EXISTS idx_owners ON owners (owner)",
+        "CREATE INDEX IF NOT EXISTS idx_owners_owner_id ON owners(owner_id)"
+    ],
+    "titles_owners": [
+        "CREATE INDEX IF NOT EXISTS idx_titles_owners_owner_id ON titles_owners(owner_id)",
+        "CREATE INDEX IF NOT EXISTS idx_titles_owners_title_id ON titles_owners(title_id)"
+    ],
+    "titles": [
+        "CREATE INDEX IF NOT EXISTS idx_titles_title_id ON titles(title_id)",
+        "CREATE INDEX IF NOT EXISTS idx_titles_title_number ON titles(title_number)"
+    ]
+}
+
+
+def to_sql_tables(tables, db_file):
+    """Save tables exactly as save_to_db did before bulk loading.
+
+    Each table is written with to_sql(if_exists="replace"), so pandas infers
+    its column types, on a connection with default pragmas. Its indexes are
+    then created on another connection. The owner key and postcode indexes
+    did not exist then, so building them counts only against save_tables.
+    """
+    for table_name, df in tables.items():
+        conn = sqlite3.connect(db_file)
+        df.to_sql(table_name, conn, if_exists="replace", index=False)
+        conn.close()
+
+        conn = sqlite3.connect(db_file)
+        for index in TO_SQL_INDEXES[table_name]:
+            conn.execute(index)
+        conn.commit()
+        conn.close()
+
+
+def bulk_load(args):
+    tables = make_tables(args.titles, args.owners, args.seed)
+    print(f"{args.titles:,} titles, {args.owners:,} owners, {len(tables['titles_owners']):,} links")
+    print(f"{'':<15}{'Seconds':>10}{'File (MB)':>12}")
+    for name, save in [("to_sql", to_sql_tables), ("save_tables", save_tables)]:
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "benchmark.db")
+            started = time.perf_counter()
+            save(tables, database)
+            seconds = time.perf_counter() - started
+            print(f"{name:<15}{seconds:>10.2f}{os.path.getsize(database) / 1048576:>12.1f}")
+
+
+def connect_per_call_title_info(database, title_number):
+    """get_title_info as it was before connections were shared: a new connection per call."""
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT address, price FROM titles WHERE title_number = ?", (title_number,))
+    result = cursor.fetchall()
+    conn.close()
+    return result
+
+
+def time_lookups(lookup, database, title_numbers, threads):
+    """Run lookups on a pool of threads and return each one's latency in seconds."""
+    def timed(title_number):
+        started = time.perf_counter()
+        lookup(database, title_number)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return np.array(list(executor.map(timed, title_numbers)))
+
+
+def search_load(args):
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "benchmark.db")
+        tables = make_tables(args.titles, args.titles // 2, args.seed)
+        save_tables(tables, database)
+
+        rng = np.random.default_rng(args.seed)
+        title_numbers = rng.choice(tables["titles"]["title_number"].to_numpy(), args.lookups)
+
+        print(f"{args.lookups:,} title lookups on {args.threads} threads, {args.titles:,} titles")
+        for name, lookup in [("Connection per call", connect_per_call_title_info),
+                             ("Shared read connections", get_title_info)]:
+            latencies = time_lookups(lookup, database, title_numbers, args.threads) * 1e6
+            print(f"{name:<25} p50 {np.percentile(latencies, 50):>8.0f}us   p99 {np.percentile(latencies, 99):>8.0f}us")
+
+
+def write_csv_file(database, owner, file_path):
+    """Export a company CSV as it was before streaming: every title formatted in memory, then written to disk."""
+    titles = format_titles(list(iter_titles_for_company(database, owner)))
+    with open(file_path, mode="w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Title number", "Address", "price"])
+        for title in titles:
+            writer.writerow([title["title_number"], title["address"], title["price"]])
+
+
+def stream_csv(database, owner, file_path):
+    """Export a company CSV as /download_csv streams it, discarding each chunk as a response would send it."""
+    for _ in iter_company_search_csv(iter_titles_for_company(database, owner)):
+        pass
+
+
+def get_peak_allocated(export, *args):
+    """Return the peak memory allocated by Python while running an export, in bytes."""
+    tracemalloc.start()
+    try:
+        export(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def csv_stream(args):
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "benchmark.db")
+
+        # One owner per result size, holding that many titles
+        tables = make_tables(max(args.sizes), 1, args.seed)
+        owners = [f"OWNER OF {size} TITLES" for size in args.sizes]
+        tables["owners"] = pd.DataFrame({
+            "owner_id": range(1, len(owners) + 1),
+            "owner": owners,
+            "owner_key": [get_owner_key(owner) for owner in owners],
+            "country": None,
+            "source": "CCOD",
+            "title_count": args.sizes
+        })
+        tables["titles_owners"] = pd.DataFrame({
+            "owner_id": np.repeat(np.arange(1, len(owners) + 1), args.sizes),
+            "title_id": np.concatenate([np.arange(1, size + 1) for size in args.sizes])
+        })
+        save_tables(tables, database)
+
+        print(f"{'Titles':>10}{'Written to disk (KB)':>24}{'Streamed (KB)':>17}")
+        for owner, size in zip(owners, args.sizes):
+            file_path = os.path.join(directory, "export.csv")
+            written = get_peak_allocated(write_csv_file, database, owner, file_path)
+            streamed = get_peak_allocated(stream_csv, database, owner, file_path)
+            print(f"{size:>10,}{written / 1024:>24,.0f}{streamed / 1024:>17,.0f}")
+
+
+def clean_owners(args):
+    rng = np.random.default_rng(args.seed)
+    names = make_owner_names(args.distinct, args.seed)
+
+    # Later proprietor columns are mostly empty, as in the datasets
+    cells = rng.choice(names, (args.rows, len(OWNER_COLUMNS)))
+    cells[rng.random(cells.shape) < [0, 0.7, 0.9, 0.97]] = np.nan
+    df = pd.DataFrame(cells, columns=OWNER_COLUMNS)
+
+    started = time.perf_counter()
+    expected = df.copy()
+    for column in OWNER_COLUMNS:
+        expected[column] = expected[column].apply(clean_owner_data)
+    per_cell_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cleaned = clean_owner_columns(df.copy())
+    vectorised_seconds = time.perf_counter() - started
+
+    print(f"{args.rows * len(OWNER_COLUMNS):,} cells, {args.distinct:,} distinct names")
+    print(f"Per-cell clean_owner_data: {per_cell_seconds:.2f}s")
+    print(f"clean_owner_columns:       {vectorised_seconds:.2f}s")
+    print(f"Output identical: {cleaned.equals(expected)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time parts of the ingest and search against the code they replaced, on synthetic data.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the synthetic data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    clean_parser = subparsers.add_parser(
+        "clean-owners", help="Compare per-cell and vectorised owner name cleaning")
+    clean_parser.add_argument("--rows", type=int, default=1000000,
+                              help="Rows of four Proprietor Name columns")
+    clean_parser.add_argument("--distinct", type=int, default=200000,
+                              help="Distinct owner names")
+    clean_parser.set_defaults(handler=clean_owners)
+
+    bulk_parser = subparsers.add_parser(
+        "bulk-load", help="Compare writing the built tables with to_sql and with save_tables")
+    bulk_parser.add_argument("--titles", type=int, default=1000000,
+                             help="Titles in the generated tables")
+    bulk_parser.add_argument("--owners", type=int, default=500000,
+                             help="Owners in the generated tables")
+    bulk_parser.set_defaults(handler=bulk_load)
+
+    load_parser = subparsers.add_parser(
+        "search-load", help="Compare title lookup latency with a connection per call and with shared connections")
+    load_parser.add_argument("--titles", type=int, default=200000,
+                             help="Titles in the generated database")
+    load_parser.add_argument("--lookups", type=int, default=20000,
+                             help="Title lookups to run")
+    load_parser.add_argument("--threads", type=int, default=8,
+                             help="Threads running lookups at once")
+    load_parser.set_defaults(handler=search_load)
+
+    csv_parser = subparsers.add_parser(
+        "csv-stream", help="Compare peak memory of company CSV exports written to disk and streamed")
+    csv_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 200000],
+                            help="Numbers of titles in the exported results")
+    csv_parser.set_defaults(handler=csv_stream)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import sys
+from constants import DATABASE
+from functions.title_search_helpers import parse_title_numbers, get_titles_with_owners
+from functions.company_search_helpers import parse_owner_names, get_titles_for_companies
+from functions.export_results_helpers import iter_bulk_title_results, iter_bulk_company_results
+
+
+def write_output(chunks, output_path, binary=False):
+    """Write text or byte chunks to a file, or to stdout when no path is given."""
+    if output_path is None:
+        stream = sys.stdout.buffer if binary else sys.stdout
+        for chunk in chunks:
+            stream.write(chunk)
+        return
+
+    # The csv module supplies its own line endings
+    mode = {"mode": "wb"} if binary else {
+        "mode": "w", "encoding": "utf-8", "newline": ""}
+    with open(output_path, **mode) as output_file:
+        for chunk in chunks:
+            output_file.write(chunk)
+
+
+def search_titles(args):
+    title_numbers = parse_title_numbers(args.input.read())
+    results = get_titles_with_owners(args.database, title_numbers)
+    write_output(iter_bulk_title_results(results, args.format), args.output)
+
+
+def search_companies(args):
+    owner_names = parse_owner_names(args.input.read())
+    results = get_titles_for_companies(args.database, owner_names)
+    write_output(iter_bulk_company_results(results, args.format),
+                 args.output, binary=args.format == "parquet")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Look up many title numbers or companies at once.")
+    parser.add_argument("--database", default=DATABASE,
+                        help="Path to the titles/owners database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    titles_parser = subparsers.add_parser(
+        "titles", help="Look up the owners of a list of title numbers")
+    titles_parser.add_argument("input", nargs="?", type=argparse.FileType("r", encoding="utf-8-sig"), default=sys.stdin,
+                               help="CSV or text file of title numbers (default: stdin)")
+    titles_parser.add_argument("--format", choices=["csv", "ndjson"], default="csv",
+                               help="Output format (default: csv)")
+    titles_parser.add_argument("--output",
+                               help="File to write the results to (default: stdout)")
+    titles_parser.set_defaults(handler=search_titles)
+
+    companies_parser = subparsers.add_parser(
+        "companies", help="Look up the titles held by a list of companies")
+    companies_parser.add_argument("input", nargs="?", type=argparse.FileType("r", encoding="utf-8-sig"), default=sys.stdin,
+                                  help="CSV or text file of company names (default: stdin)")
+    companies_parser.add_argument("--format", choices=["csv", "ndjson", "parquet"], default="csv",
+                                  help="Output format (default: csv). Parquet requires pyarrow")
+    companies_parser.add_argument("--output",
+                                  help="File to write the results to (default: stdout)")
+    companies_parser.set_defaults(handler=search_companies)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
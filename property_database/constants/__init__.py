@@ -1,3 +1,5 @@
+import os
+
 DATASETS_COLUMNS = {
     "ocod": [
         "Title Number",
@@ -40,3 +42,97 @@ DTYPE_DICT = {
 DATABASE = "../instance/database/titles_owners_database.db"
 
 OUTPUT_FILE_DIRECTORY = "instance/outputs"
+
+OWNER_SUGGESTIONS_LIMIT = 10
+
+OWNER_SUGGESTIONS_MAX_LIMIT = 50
+
+# Short prefixes whose rankings are kept, least recently used dropped first
+OWNER_SUGGESTIONS_RANKED_PREFIXES = 1024
+
+CO_OWNERS_LIMIT = 50
+
+CO_OWNERS_MAX_LIMIT = 1000
+
+OWNER_NETWORK_MAX_HOPS = 3
+
+STREAMING_INGEST = False
+
+INGEST_MEMORY_LIMIT_MB = 512
+
+INGEST_PROBE_ROWS = 1000
+
+BULK_LOAD_BATCH_SIZE = 100000
+
+LAND_REGISTRY_API_URL = "https://use-land-property-data.service.gov.uk/api/v1/datasets"
+
+TEMP_DIRECTORY = "instance/temp"
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+SQLITE_CACHE_SIZE = -64 * 1024
+
+SQLITE_CACHED_STATEMENTS = 256
+
+BULK_LOOKUP_CHUNK_SIZE = 500
+
+CSV_STREAM_BATCH_ROWS = 1000
+
+EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+EXPORT_TTL_SECONDS = 24 * 60 * 60
+
+EXPORT_JANITOR_INTERVAL_SECONDS = 60
+
+# Export links are signed for the search they were issued with and expire
+EXPORT_TOKEN_TTL_SECONDS = 60 * 60
+
+# Signs export links. Set it when running several processes, so a link issued
+# by one is accepted by the others
+SECRET_KEY = os.environ.get("PROPERTY_DATABASE_SECRET_KEY")
+
+COMPANY_RESULTS_PAGE_SIZE = 100
+
+COMPANY_RESULTS_MAX_PAGE_SIZE = 1000
+
+FULL_TEXT_SEARCH_LIMIT = 20
+
+FULL_TEXT_SEARCH_MAX_LIMIT = 100
+
+FULL_TEXT_CANDIDATES = 200
+
+FULL_TEXT_FUZZY_TRIGRAMS = 8
+
+FULL_TEXT_MAX_TERM_DOCS = 20000
+
+POSTCODE_OWNERS_LIMIT = 50
+
+POSTCODE_RESULTS_PAGE_SIZE = 100
+
+POSTCODE_RESULTS_MAX_PAGE_SIZE = 1000
+
+STATISTICS_TOP_OWNERS_LIMIT = 20
+
+STATISTICS_TOP_OWNERS_MAX_LIMIT = 1000
+
+SNAPSHOT_DIRECTORY = "../instance/database/snapshots"
+
+SNAPSHOTS_TO_KEEP = 3
+
+ANALYTICS_DIRECTORY = "../instance/analytics"
+
+EXPORT_ANALYTICS = True
+
+ANALYTICS_PART_ROWS = 1000000
+
+HISTORY_DATABASE = "../instance/database/history.db"
+
+RECORD_HISTORY = True
+
+JOBS_TO_KEEP = 20
+
+RESULT_CACHE_MAX_ENTRIES = 1024
+
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
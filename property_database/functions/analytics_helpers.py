@@ -0,0 +1,221 @@
+import os
+import time
+import importlib.util
+import shutil
+import sqlite3
+import logging
+import pandas as pd
+from constants import DATABASE, ANALYTICS_DIRECTORY, ANALYTICS_PART_ROWS, SNAPSHOT_DIRECTORY
+from functions.database_helpers import read_dataset_version
+from functions.snapshot_helpers import SNAPSHOT_PREFIX, list_snapshots
+
+
+logger = logging.getLogger(__name__)
+
+# The normalised tables as exported, in the order analysts usually join them
+ANALYTICS_QUERIES = {
+    "titles": "SELECT title_id, title_number, address, price, postcode FROM titles ORDER BY title_id",
+    "owners": "SELECT owner_id, owner, owner_key, country, source, title_count FROM owners ORDER BY owner_id",
+    "titles_owners": "SELECT owner_id, title_id FROM titles_owners ORDER BY owner_id, title_id"
+}
+
+# Countries and sources repeat throughout, so they are stored once per part
+# file. Owner names are unique per row and are stored as plain text
+DICTIONARY_COLUMNS = {"country", "source"}
+
+
+def get_analytics_schemas():
+    """Return the Arrow schema of each exported table."""
+    import pyarrow as pa
+
+    text = pa.string()
+    labels = pa.dictionary(pa.int32(), pa.string())
+    return {
+        "titles": pa.schema([("title_id", pa.int32()), ("title_number", text), ("address", text),
+                             ("price", pa.float64()), ("postcode", text)]),
+        "owners": pa.schema([("owner_id", pa.int32()), ("owner", text), ("owner_key", text),
+                             ("country", labels), ("source", labels), ("title_count", pa.int32())]),
+        "titles_owners": pa.schema([("owner_id", pa.int32()), ("title_id", pa.int32())])
+    }
+
+
+def get_analytics_path(snapshot_path, analytics_directory=ANALYTICS_DIRECTORY):
+    """Return the directory a snapshot's columnar export is written to."""
+    version = os.path.basename(snapshot_path)[len(SNAPSHOT_PREFIX):-len(".db")]
+    return os.path.join(analytics_directory, version)
+
+
+def write_table_parts(conn, table_name, schema, table_directory):
+    """Write a table as Arrow IPC files of up to ANALYTICS_PART_ROWS rows each. Returns the row count."""
+    import pyarrow as pa
+
+    os.makedirs(table_directory)
+    cursor = conn.execute(ANALYTICS_QUERIES[table_name])
+    rows_written = 0
+    part = 0
+
+    # Always write one part, so an empty table still has a schema
+    while True:
+        rows = cursor.fetchmany(ANALYTICS_PART_ROWS)
+        if rows or part == 0:
+            columns = list(zip(*rows)) or [[] for _ in schema]
+            arrays = [pa.array(column, type=field.type.value_type).dictionary_encode()
+                      if field.name in DICTIONARY_COLUMNS else pa.array(column, type=field.type)
+                      for column, field in zip(columns, schema)]
+
+            # Uncompressed, so the files can be memory mapped and read in place
+            part_path = os.path.join(table_directory, f"part-{part:05d}.arrow")
+            with pa.OSFile(part_path, "wb") as part_file, pa.ipc.new_file(part_file, schema) as writer:
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+            rows_written += len(rows)
+            part += 1
+        if len(rows) < ANALYTICS_PART_ROWS:
+            return rows_written
+
+
+def export_snapshot(snapshot_path, analytics_directory=ANALYTICS_DIRECTORY):
+    """Write a snapshot's tables as a columnar export next to the other snapshots' exports.
+
+    Each table is a directory of Arrow IPC files. The export is written to a
+    temporary directory and renamed into place, so a finished export is
+    never seen half written. Returns the time taken in seconds, or None if
+    pyarrow is not installed.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        logger.warning("pyarrow is not installed, so no columnar export was written. "
+                       "Install it with `pip install pyarrow`, or set EXPORT_ANALYTICS = False")
+        return None
+
+    started = time.perf_counter()
+    export_path = get_analytics_path(snapshot_path, analytics_directory)
+    partial_path = f"{export_path}.partial"
+    shutil.rmtree(partial_path, ignore_errors=True)
+
+    conn = sqlite3.connect(snapshot_path)
+    try:
+        for table_name, schema in get_analytics_schemas().items():
+            write_table_parts(conn, table_name, schema,
+                              os.path.join(partial_path, table_name))
+    except Exception:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+
+    shutil.rmtree(export_path, ignore_errors=True)
+    os.replace(partial_path, export_path)
+
+    seconds = time.perf_counter() - started
+    logger.info("Wrote the columnar export in %.2fs", seconds)
+    return seconds
+
+
+def remove_export(snapshot_path, analytics_directory=ANALYTICS_DIRECTORY):
+    """Delete a snapshot's columnar export, finished or not."""
+    export_path = get_analytics_path(snapshot_path, analytics_directory)
+    for path in (export_path, f"{export_path}.partial"):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def prune_exports(analytics_directory=ANALYTICS_DIRECTORY, snapshot_directory=SNAPSHOT_DIRECTORY):
+    """Delete the exports of snapshots that have been pruned."""
+    if not os.path.isdir(analytics_directory):
+        return
+
+    kept = {os.path.basename(get_analytics_path(snapshot_path, analytics_directory))
+            for snapshot_path in list_snapshots(snapshot_directory)}
+    for name in os.listdir(analytics_directory):
+        if name not in kept:
+            try:
+                shutil.rmtree(os.path.join(analytics_directory, name))
+            except OSError:
+                # Still memory mapped elsewhere on platforms that lock open files
+                logger.warning("Could not remove %s", name)
+
+
+def get_live_export_path(database=DATABASE, analytics_directory=ANALYTICS_DIRECTORY):
+    """Return the export of the database being served, or None if it has none."""
+    version = read_dataset_version(database) if os.path.exists(database) else None
+    if version is None:
+        return None
+
+    export_path = os.path.join(analytics_directory, version)
+    return export_path if os.path.isdir(export_path) else None
+
+
+def load_arrow_table(table_directory):
+    """Memory map a table's part files into a single Arrow table without copying them."""
+    import pyarrow as pa
+
+    parts = sorted(name for name in os.listdir(table_directory)
+                   if name.endswith(".arrow"))
+    return pa.concat_tables(pa.ipc.open_file(pa.memory_map(os.path.join(table_directory, name))).read_all()
+                            for name in parts)
+
+
+def load_analytics_tables(export_path=None, tables=tuple(ANALYTICS_QUERIES)):
+    """Load exported tables as DataFrames, keyed by table name.
+
+    Columns use pyarrow-backed dtypes, so the DataFrames read the memory
+    mapped files in place rather than copying them into memory. Defaults
+    to the export of the database being served. Raises ValueError if there
+    is no export, and ImportError if pyarrow is not installed.
+    """
+    export_path = export_path or get_live_export_path()
+    if export_path is None:
+        raise ValueError(
+            "The database being served has no columnar export. Download the dataset again to write one.")
+
+    return {table_name: load_arrow_table(os.path.join(export_path, table_name)).to_pandas(types_mapper=pd.ArrowDtype)
+            for table_name in tables}
+
+
+def get_directory_size(directory):
+    """Return the total size of the files in a directory tree, in bytes."""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def get_table_sizes(conn, table_names):
+    """Return the bytes of pages each table uses in SQLite, or None if this build cannot report them."""
+    placeholders = ", ".join("?" for _ in table_names)
+    try:
+        return dict(conn.execute(f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) GROUP BY name",
+                                 list(table_names)).fetchall())
+    except sqlite3.OperationalError:
+        return None
+
+
+def benchmark_export(database=DATABASE, export_path=None):
+    """Time loading every table into pandas from the SQLite database and from its columnar export.
+
+    Returns the load times in seconds and the sizes in bytes of each table,
+    and the size of the whole database file.
+    """
+    export_path = export_path or get_live_export_path(database)
+    if export_path is None:
+        raise ValueError(
+            "The database has no columnar export. Download the dataset again to write one.")
+
+    tables = {}
+    conn = sqlite3.connect(database)
+    try:
+        sqlite_sizes = get_table_sizes(conn, list(ANALYTICS_QUERIES)) or {}
+        for table_name, query in ANALYTICS_QUERIES.items():
+            started = time.perf_counter()
+            pd.read_sql_query(query, conn)
+            sqlite_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            load_analytics_tables(export_path, [table_name])
+            tables[table_name] = {
+                "sqlite_seconds": sqlite_seconds,
+                "export_seconds": time.perf_counter() - started,
+                "sqlite_bytes": sqlite_sizes.get(table_name),
+                "export_bytes": get_directory_size(os.path.join(export_path, table_name))
+            }
+    finally:
+        conn.close()
+
+    return {"tables": tables, "database_bytes": os.path.getsize(database)}
@@ -0,0 +1,25 @@
+import csv
+import io
+
+
+def read_column_values(text, header_names):
+    """Read values from pasted text or an uploaded CSV, keeping their order.
+
+    Values are taken from the first column, or from the first column whose
+    header matches one of `header_names` if the first row is a header.
+    Blank cells are dropped.
+    """
+    delimiter = "\t" if "\t" in text else ","
+    rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+    column = 0
+
+    if rows:
+        header = [cell.strip().upper() for cell in rows[0]]
+        matches = [index for index, cell in enumerate(header)
+                   if cell in header_names]
+        if matches:
+            column = matches[0]
+            rows = rows[1:]
+
+    values = [row[column].strip() for row in rows if len(row) > column]
+    return [value for value in values if value]
@@ -1,10 +1,13 @@
-import sqlite3
+from constants import BULK_LOOKUP_CHUNK_SIZE
+from functions.bulk_search_helpers import read_column_values
+from functions.database_helpers import get_read_connection
+from functions.normalise_helpers import get_owner_key
+from functions.title_search_helpers import format_owner_country
 
 
 def get_owner_info(DATABASE, owner):
     """Fetch owner information from the database."""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+    cursor = get_read_connection(DATABASE).cursor()
     query = """
     SELECT
         country,
@@ -12,18 +15,20 @@ def get_owner_info(DATABASE, owner):
     FROM
         owners
     WHERE
-        owner = ?
+        owner_key = ?
+    ORDER BY
+        title_count DESC
+    LIMIT 1
     """
-    cursor.execute(query, (owner,))
+    cursor.execute(query, (get_owner_key(owner),))
     result = cursor.fetchall()
-    conn.close()
+    cursor.close()
     return result
 
 
-def get_titles_for_company(DATABASE, owner):
-    """Fetch titles associated with the owner from the database."""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+def iter_titles_for_company(DATABASE, owner):
+    """Yield titles associated with the owner straight from the cursor."""
+    cursor = get_read_connection(DATABASE).cursor()
     query = """
     SELECT
         titles.title_number,
@@ -34,17 +39,153 @@ def get_titles_for_company(DATABASE, owner):
     JOIN
         titles_owners ON titles_owners.title_id = titles.title_id
     WHERE
-        titles_owners.owner_id = (
-            SELECT owner_id FROM owners WHERE owner = ?
-        );
+        titles_owners.owner_id = (SELECT owner_id FROM owners WHERE owner_key = ? ORDER BY title_count DESC LIMIT 1)
     """
-    cursor.execute(query, (owner,))
+    try:
+        cursor.execute(query, (get_owner_key(owner),))
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def get_company_info(DATABASE, owner):
+    """Fetch owner information and the owner's titles in a single query."""
+    cursor = get_read_connection(DATABASE).cursor()
+    query = """
+    SELECT
+        owners.country,
+        owners.source,
+        titles.title_number,
+        titles.address,
+        titles.price
+    FROM
+        owners
+    LEFT JOIN
+        titles_owners ON titles_owners.owner_id = owners.owner_id
+    LEFT JOIN
+        titles ON titles.title_id = titles_owners.title_id
+    WHERE
+        owners.owner_id = (SELECT owner_id FROM owners WHERE owner_key = ? ORDER BY title_count DESC LIMIT 1)
+    """
+    cursor.execute(query, (get_owner_key(owner),))
     result = cursor.fetchall()
-    conn.close()
+    cursor.close()
+
+    # Every row repeats the owner's details, so take them from the first
+    owner_info = [result[0][:2]] if result else []
+    titles = [row[2:] for row in result if row[2] is not None]
 
+    return owner_info, titles
+
+
+def get_owner_summary(DATABASE, owner):
+    """Fetch an owner's name as stored, country, source and precomputed title count, or None."""
+    cursor = get_read_connection(DATABASE).cursor()
+    query = """
+    SELECT
+        owner,
+        country,
+        source,
+        title_count
+    FROM
+        owners
+    WHERE
+        owner_key = ?
+    ORDER BY
+        title_count DESC
+    LIMIT 1
+    """
+    cursor.execute(query, (get_owner_key(owner),))
+    result = cursor.fetchone()
+    cursor.close()
     return result
 
 
+def get_owner_id(DATABASE, owner):
+    """Fetch the ID of the owner a search finds, or None."""
+    cursor = get_read_connection(DATABASE).cursor()
+    query = """
+    SELECT
+        owner_id
+    FROM
+        owners
+    WHERE
+        owner_key = ?
+    ORDER BY
+        title_count DESC
+    LIMIT 1
+    """
+    cursor.execute(query, (get_owner_key(owner),))
+    result = cursor.fetchone()
+    cursor.close()
+    return result[0] if result else None
+
+
+def get_owners_by_id(database, owner_ids):
+    """Fetch owners by ID, as a dict of owner details keyed by ID."""
+    owners = {}
+    cursor = get_read_connection(database).cursor()
+    try:
+        for start in range(0, len(owner_ids), BULK_LOOKUP_CHUNK_SIZE):
+            batch = owner_ids[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            query = f"""
+            SELECT
+                owner_id,
+                owner,
+                country,
+                source,
+                title_count
+            FROM
+                owners
+            WHERE
+                owner_id IN ({placeholders})
+            """
+            cursor.execute(query, batch)
+            for owner_id, owner, country, source, title_count in cursor.fetchall():
+                owners[owner_id] = {"owner": owner, "country": format_owner_country(country, source),
+                                    "source": source, "title_count": title_count}
+    finally:
+        cursor.close()
+
+    return owners
+
+
+def get_titles_page(DATABASE, owner, after_title_id, limit):
+    """Fetch a page of the owner's titles ordered by title ID, starting after a given ID.
+
+    Returns the (title_number, address, price) rows and the ID to pass as
+    after_title_id for the next page, or None if this is the last page.
+    """
+    cursor = get_read_connection(DATABASE).cursor()
+    query = """
+    SELECT
+        titles.title_id,
+        titles.title_number,
+        titles.address,
+        titles.price
+    FROM
+        titles_owners
+    JOIN
+        titles ON titles.title_id = titles_owners.title_id
+    WHERE
+        titles_owners.owner_id = (SELECT owner_id FROM owners WHERE owner_key = ? ORDER BY title_count DESC LIMIT 1)
+        AND titles_owners.title_id > ?
+    ORDER BY
+        titles_owners.title_id
+    LIMIT ?
+    """
+    # Matching a single owner_id lets the titles_owners primary key return
+    # rows already in order, so each page reads only its own rows.
+    # One extra row is fetched to find out whether there is another page.
+    cursor.execute(query, (get_owner_key(owner), after_title_id, limit + 1))
+    result = cursor.fetchall()
+    cursor.close()
+
+    next_after_title_id = result[limit - 1][0] if len(result) > limit else None
+    return [row[1:] for row in result[:limit]], next_after_title_id
+
+
 def format_incorporation_info(owner, owner_info):
     country, source = owner_info[0]
 
@@ -62,9 +203,95 @@ def format_titles(titles_info):
                "price": title[2]} for title in titles_info]
 
     for title in titles:
-        if title["price"]:
-            title["price"] = f"GBP {int(title["price"]):,}"
-        elif title["price"] is None:
-            title["price"] = "No data"
+        title["price"] = format_price(title["price"])
 
     return titles
+
+
+def format_price(price):
+    if price:
+        return f"GBP {int(price):,}"
+    elif price is None:
+        return "No data"
+
+    return price
+
+
+def parse_owner_names(text):
+    """Read owner names from pasted text or an uploaded CSV, keyed by their lookup key.
+
+    Returns a dict of owner key to the name as it was given, so results can
+    be reported against the original list.
+    """
+    owner_names = read_column_values(
+        text, ["OWNER", "COMPANY", "NAME", "PROPRIETOR NAME"])
+
+    owner_keys = {}
+    for owner_name in owner_names:
+        owner_keys.setdefault(get_owner_key(owner_name), owner_name)
+
+    owner_keys.pop("", None)
+    return owner_keys
+
+
+def get_titles_for_companies(database, owner_names):
+    """Yield a row per title held by each owner, querying a chunk of owners at a time.
+
+    `owner_names` maps owner keys to the names as given. Rows are streamed
+    from the cursor; owners with no match yield a single row with `found`
+    set to False. Every owner sharing a key is included.
+    """
+    cursor = get_read_connection(database).cursor()
+    owner_keys = list(owner_names)
+    try:
+        for start in range(0, len(owner_keys), BULK_LOOKUP_CHUNK_SIZE):
+            batch = owner_keys[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            query = f"""
+            SELECT
+                owners.owner_key,
+                owners.owner,
+                owners.country,
+                owners.source,
+                titles.title_number,
+                titles.address,
+                titles.price
+            FROM
+                owners
+            JOIN
+                titles_owners ON titles_owners.owner_id = owners.owner_id
+            JOIN
+                titles ON titles.title_id = titles_owners.title_id
+            WHERE
+                owners.owner_key IN ({placeholders})
+            """
+            cursor.execute(query, batch)
+
+            found = set()
+            for owner_key, owner, country, source, title_number, address, price in cursor:
+                found.add(owner_key)
+                yield {
+                    "query": owner_names[owner_key],
+                    "found": True,
+                    "owner": owner,
+                    "country": format_owner_country(country, source),
+                    "source": source,
+                    "title_number": title_number,
+                    "address": address,
+                    "price": price
+                }
+
+            for owner_key in batch:
+                if owner_key not in found:
+                    yield {
+                        "query": owner_names[owner_key],
+                        "found": False,
+                        "owner": None,
+                        "country": None,
+                        "source": None,
+                        "title_number": None,
+                        "address": None,
+                        "price": None
+                    }
+    finally:
+        cursor.close()
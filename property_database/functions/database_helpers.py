@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from constants import SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_CACHED_STATEMENTS
+
+
+_local = threading.local()
+
+# The version of each database, with the inode it was read from
+_versions = {}
+
+
+def open_read_connection(database):
+    """Open a read-only connection to the database with read pragmas applied."""
+    uri = f"{Path(database).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(
+        uri, uri=True, cached_statements=SQLITE_CACHED_STATEMENTS)
+
+    # Negative cache sizes are in KiB rather than pages
+    conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size = {int(SQLITE_CACHE_SIZE)}")
+    conn.execute("PRAGMA query_only = ON")
+
+    return conn
+
+
+def get_read_connection(database):
+    """Return this thread's cached read-only connection to the database.
+
+    Connections live for the life of the thread, so the page cache and the
+    prepared statement cache are reused across requests. A connection is
+    reopened if the database file has been replaced.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    inode = os.stat(database).st_ino
+    cached = connections.get(database)
+    if cached and cached[0] == inode:
+        return cached[1]
+
+    if cached:
+        cached[1].close()
+
+    conn = open_read_connection(database)
+    connections[database] = (inode, conn)
+    return conn
+
+
+def read_dataset_version(database):
+    """Read the version stamped into the database when it was built, or None."""
+    try:
+        cursor = get_read_connection(database).cursor()
+        cursor.execute("SELECT version FROM dataset_version")
+        result = cursor.fetchone()
+        cursor.close()
+    except sqlite3.OperationalError:
+        # Built before databases were stamped
+        return None
+
+    return result[0] if result else None
+
+
+def get_dataset_version(database):
+    """Return a stamp that changes whenever a different database is served.
+
+    The stamp is read from the database once per file, so checking it costs
+    a stat. Databases built before they were stamped fall back to their
+    modification time and size.
+    """
+    if not os.path.exists(database):
+        return None
+
+    stat = os.stat(database)
+    cached = _versions.get(database)
+    if cached and cached[0] == stat.st_ino:
+        return cached[1]
+
+    version = read_dataset_version(
+        database) or f"{stat.st_mtime_ns}-{stat.st_size}"
+    _versions[database] = (stat.st_ino, version)
+    return version
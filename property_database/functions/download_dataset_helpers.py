@@ -1,14 +1,46 @@
 import os
 import re
 import sqlite3
+import logging
+import threading
+import time
 import requests
 import shutil
-import urllib.request
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import render_template
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from zipfile import ZipFile
-from constants import DATABASE, DATASETS_COLUMNS, DTYPE_DICT
+from constants import DATABASE, DATASETS_COLUMNS, DTYPE_DICT, STREAMING_INGEST, INGEST_MEMORY_LIMIT_MB, INGEST_PROBE_ROWS, BULK_LOAD_BATCH_SIZE, LAND_REGISTRY_API_URL, TEMP_DIRECTORY, DOWNLOAD_CHUNK_SIZE, RECORD_HISTORY, EXPORT_ANALYTICS
+from functions.analytics_helpers import export_snapshot, remove_export, prune_exports
+from functions.history_helpers import record_release
+from functions.normalise_helpers import MULTIPLE_SPACES_PATTERN, LTD_PATTERN, DISALLOWED_OWNER_CHARS_PATTERN, get_owner_key
+from functions.owner_graph_helpers import build_owner_graph
+from functions.statistics_helpers import build_statistics, add_statistics
+from functions.snapshot_helpers import create_snapshot_path, copy_database, stamp_snapshot, validate_snapshot, activate_snapshot, prune_snapshots
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+# Latest full release, a historical full release, or the latest Change Only files
+DOWNLOAD_OPTIONS = ("latest", "historical", "update")
+# The year and month in a release's file name, e.g. OCOD_FULL_2024_10.csv
+RELEASE_MONTH_PATTERN = re.compile(r"(\d{4})_(\d{2})")
+# A UK postcode at the end of an address, optionally in brackets
+POSTCODE_PATTERN = re.compile(
+    r"\b([A-Z]{1,2}[0-9][A-Z0-9]?) ?([0-9][A-Z]{2})\)?\s*$")
+
+
+def skip_stage(stage):
+    """Stage callback for builds that are not run as a background job."""
 
 
 def validate_api_key(api_key):
@@ -53,6 +85,10 @@ def validate_inputs(api_key, download_option, converted_month, input_year, curre
     elif not validate_api_key(api_key):
         return "Error: Invalid API key"
 
+    # Validate the download option, which names the files to fetch
+    if download_option not in DOWNLOAD_OPTIONS:
+        return "Error: Invalid download option"
+
     # Validate inputs for historical downloads
     if download_option == "historical":
         if not converted_month:
@@ -71,6 +107,10 @@ def validate_inputs(api_key, download_option, converted_month, input_year, curre
         if not validate_date(month_number, year_number, current_month_start):
             return "Error: Date cannot be in the future"
 
+    # Change only files are applied on top of an existing database
+    if download_option == "update" and not os.path.exists(DATABASE):
+        return "Error: Download the full dataset before applying updates"
+
     # All checks passed
     return None
 
@@ -78,10 +118,11 @@ def validate_inputs(api_key, download_option, converted_month, input_year, curre
 def get_file_name(download_option, dataset, input_year, converted_month, headers):
     if download_option == "historical":
         return f"{dataset.upper()}_FULL_{input_year}_{converted_month}.zip"
-    if download_option == "latest":
+    if download_option in ("latest", "update"):
+        resource_name = "Change Only File" if download_option == "update" else "Full File"
         try:
             response = requests.get(
-                fr"https://use-land-property-data.service.gov.uk/api/v1/datasets/{dataset}", headers=headers)
+                fr"{LAND_REGISTRY_API_URL}/{dataset}", headers=headers)
             response.raise_for_status()
         except requests.exceptions.HTTPError as http_err:
             return f"HTTP error occurred: {http_err}"
@@ -94,23 +135,23 @@ def get_file_name(download_option, dataset, input_year, converted_month, headers
         except ValueError as error_text:
             return f"JSON decoding error: {error_text}"
 
-        full_file_name = next(
+        file_name = next(
             (resource["file_name"] for resource in downloaded_data["result"]
-             ["resources"] if resource["name"] == "Full File"),
+             ["resources"] if resource["name"] == resource_name),
             None
         )
-        return full_file_name
+        return file_name
 
 
-def process_dataset_download(api_key, download_option, dataset, input_year, converted_month):
+def process_dataset_download(api_key, download_option, dataset, input_year, converted_month, progress=None, stop=None):
     headers = {"Authorization": api_key, "Accept": "application/json"}
     file_name = get_file_name(download_option, dataset,
                               input_year, converted_month, headers)
 
-    if download_option == "latest":
-        base_url = fr"https://use-land-property-data.service.gov.uk/api/v1/datasets"
+    if download_option in ("latest", "update"):
+        base_url = LAND_REGISTRY_API_URL
     elif download_option == "historical":
-        base_url = fr"https://use-land-property-data.service.gov.uk/api/v1/datasets/history"
+        base_url = fr"{LAND_REGISTRY_API_URL}/history"
 
     # Attempt to download data
     try:
@@ -132,44 +173,167 @@ def process_dataset_download(api_key, download_option, dataset, input_year, conv
         return "Download URL not found in the response."
 
     download_url = downloaded_data["result"]["download_url"]
-    return download_and_extract_zip(download_url, dataset)
+    return download_zip(download_url, dataset, progress, stop)
+
+
+def get_zip_path(dataset):
+    """Return where the downloaded zip for a dataset is stored."""
+    return os.path.join(TEMP_DIRECTORY, f"{dataset}.zip")
+
+
+@contextmanager
+def open_dataset_csv(file_path):
+    """Open a dataset CSV for reading, straight out of its zip if it is zipped."""
+    if not file_path.lower().endswith(".zip"):
+        with open(file_path, "rb") as csv_file:
+            yield csv_file
+        return
+
+    with ZipFile(file_path, "r") as zip_ref:
+        file_name = next((name for name in zip_ref.namelist()
+                          if name.lower().endswith(".csv")), None)
+        if file_name is None:
+            raise ValueError(f"No CSV file found in {file_path}")
+        with zip_ref.open(file_name) as csv_file:
+            yield csv_file
+
+
+def get_release_month(file_path):
+    """Return the release month of a dataset as a YYYYMM integer, read from its file names, or None."""
+    names = [os.path.basename(file_path)]
+    if file_path.lower().endswith(".zip"):
+        with ZipFile(file_path, "r") as zip_ref:
+            names += zip_ref.namelist()
+
+    for name in names:
+        match = RELEASE_MONTH_PATTERN.search(name)
+        if match:
+            return int(match.group(1)) * 100 + int(match.group(2))
+
+    return None
+
 
+def log_download_progress(dataset):
+    """Return a progress callback that logs every 10% of a download."""
+    last_logged = [-1]
+
+    def progress(downloaded, total):
+        if not total:
+            return
+        percent = downloaded * 100 // total
+        if percent // 10 > last_logged[0]:
+            last_logged[0] = percent // 10
+            logger.info("%s: downloaded %d%% (%d of %d bytes)",
+                        dataset.upper(), percent, downloaded, total)
+
+    return progress
+
+
+class DownloadStopped(Exception):
+    """Raised in a download once another download it runs alongside has failed."""
+
+
+def download_file(download_url, destination, progress=None, stop=None):
+    """Stream a file to disk in chunks, reporting progress as it goes.
+
+    If given, `stop` is an Event checked before each chunk is written, so
+    a download can be abandoned part way through.
+    """
+    with requests.get(download_url, stream=True) as response:
+        response.raise_for_status()
+        total = int(response.headers.get("Content-Length", 0)) or None
+        downloaded = 0
+
+        with open(destination, "wb") as output_file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if stop is not None and stop.is_set():
+                    raise DownloadStopped("stopped after another download failed")
+                output_file.write(chunk)
+                downloaded += len(chunk)
+                if progress:
+                    progress(downloaded, total)
 
-def download_and_extract_zip(download_url, dataset):
-    # Define paths
-    temp_dir = "instance/temp"
-    zip_file = os.path.join(temp_dir, f"{dataset.upper()}.zip")
-    csv_file = os.path.join(temp_dir, f"{dataset.upper()}.csv")
+
+def download_zip(download_url, dataset, progress=None, stop=None):
+    """Download a dataset zip. The CSV is later read from it without extracting."""
+    zip_file = get_zip_path(dataset)
 
     # Create temp directory if it doesn't exist
-    os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(TEMP_DIRECTORY, exist_ok=True)
 
-    # Download file
+    # Download file. Other datasets may be downloading into the same
+    # directory, so only this dataset's file is removed on failure
     try:
-        urllib.request.urlretrieve(download_url, zip_file)
+        download_file(download_url, zip_file,
+                      progress or log_download_progress(dataset), stop)
     except Exception as download_err:
-        cleanup_temp(temp_dir)
+        remove_files(zip_file)
         return f"Download error: {download_err}"
 
-    # Extract file
+    # Check the archive holds a CSV before handing it to the ingest
     try:
         with ZipFile(zip_file, "r") as zip_ref:
-            if not zip_ref.namelist():
-                cleanup_temp(temp_dir)
+            if not any(name.lower().endswith(".csv") for name in zip_ref.namelist()):
+                remove_files(zip_file)
                 return "Zip file is empty or corrupted."
-            file_name = zip_ref.namelist()[0]
-            zip_ref.extractall(temp_dir)
-            os.rename(os.path.join(temp_dir, file_name), csv_file)
     except Exception as zip_err:
-        cleanup_temp(temp_dir)
+        remove_files(zip_file)
         return f"Zip extraction error: {zip_err}"
-    finally:
-        if os.path.exists(zip_file):
-            os.remove(zip_file)
 
     return None
 
 
+def remove_files(*file_paths):
+    """Delete the given files if they exist."""
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def download_datasets(api_key, download_option, input_year, converted_month, progress=None):
+    """Download every dataset concurrently.
+
+    For a full, non-streaming ingest each CSV is parsed as soon as its own
+    download finishes, while the other is still downloading. If given,
+    `progress(dataset, downloaded, total)` is called as each chunk arrives.
+    Returns an error message (or None) and the parsed DataFrames keyed by
+    dataset.
+    """
+    parse_early = download_option != "update" and not STREAMING_INGEST
+    datasets = {}
+    # Set when a download fails, so the others stop at their next chunk
+    stop = threading.Event()
+
+    # One worker per download plus one per early parse
+    with ThreadPoolExecutor(max_workers=len(DATASETS_COLUMNS) * 2) as executor:
+        downloads = {
+            executor.submit(process_dataset_download, api_key, download_option, dataset, input_year,
+                            converted_month, progress and partial(progress, dataset), stop): dataset
+            for dataset in DATASETS_COLUMNS
+        }
+        parses = {}
+
+        for future in as_completed(downloads):
+            error = future.result()
+            if error:
+                stop.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                return error, {}
+
+            dataset = downloads[future]
+            if parse_early:
+                parses[dataset] = executor.submit(
+                    load_data, get_zip_path(dataset), DATASETS_COLUMNS[dataset], DTYPE_DICT, dataset.upper())
+
+        for dataset, future in parses.items():
+            try:
+                datasets[dataset] = future.result()
+            except Exception as parse_err:
+                return f"CSV parsing error: {parse_err}", {}
+
+    return None, datasets
+
+
 def cleanup_temp(temp_dir):
     """Delete the contents of the temp directory."""
     if os.path.exists(temp_dir):
@@ -182,8 +346,9 @@ def load_data(file_path, columns, dtypes, source):
     if not os.path.exists(file_path):
         return render_template("download_error.html", message=f"The file {file_path} does not exist.")
 
-    data = pd.read_csv(file_path, encoding="utf-8",
-                       usecols=columns, dtype=dtypes)
+    with open_dataset_csv(file_path) as csv_file:
+        data = pd.read_csv(csv_file, encoding="utf-8",
+                           usecols=columns, dtype=dtypes)
 
     filtered_data = data[data["Title Number"] != "Row Count"]
 
@@ -196,39 +361,50 @@ def concatenate(ocod_df, ccod_df):
     merged = pd.concat([ocod_df, ccod_df], axis=0,
                        join="outer", ignore_index=True)
 
-    for i in range(1, 5):
-        merged[f"Proprietor Name ({i})"] = merged[f"Proprietor Name ({
-            i})"].apply(clean_owner_data)
+    return clean_owner_columns(merged)
 
-    return merged
 
+def clean_owner_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean the four Proprietor Name columns, cleaning each distinct name once."""
+    owner_columns = [f"Proprietor Name ({i})" for i in range(1, 5)]
+    cleaned_names = normalise_owner_names(
+        pd.unique(df[owner_columns].to_numpy().ravel()))
 
-def clean_owner_data(owner):
-    """Clean the 'owner' column data."""
-    if not isinstance(owner, str):
-        return owner
+    for owner_column in owner_columns:
+        df[owner_column] = df[owner_column].map(cleaned_names)
 
-    # Remove extra spaces and make it uppercase
-    owner = re.sub(r"\s{2,}", " ", owner.strip()).upper()
+    return df
 
-    # Replace "LTD" with "LIMITED" to minimise duplicates
-    owner = re.sub("LTD", "LIMITED", owner, flags=re.IGNORECASE)
 
-    # Remove unwanted characters
-    allowed_chars = r"[^()A-Z0-9&@£$€¥#.,:; ]"
-    owner = re.sub(allowed_chars, "", owner, flags=re.IGNORECASE)
+def normalise_owner_names(names) -> dict:
+    """Map each distinct owner name to its cleaned form, as clean_owner_data would."""
+    names = pd.Series(names, dtype=object).dropna()
+    is_text = names.map(lambda name: isinstance(name, str)).astype(bool)
+    text = names[is_text]
 
-    return owner
+    cleaned = text.str.strip().str.replace(
+        MULTIPLE_SPACES_PATTERN, " ", regex=True).str.upper()
+    cleaned = cleaned.str.replace(
+        DISALLOWED_OWNER_CHARS_PATTERN, "", regex=True)
+    cleaned = cleaned.str.replace(
+        MULTIPLE_SPACES_PATTERN, " ", regex=True).str.strip()
+    cleaned = cleaned.str.replace(LTD_PATTERN, "LIMITED", regex=True)
 
+    # Anything that is not a string is passed through unchanged
+    cleaned_names = dict(zip(names[~is_text], names[~is_text]))
+    cleaned_names.update(zip(text, cleaned))
 
-def create_titles_table(df: pd.DataFrame) -> pd.DataFrame:
+    return cleaned_names
+
+
+def create_titles_table(df: pd.DataFrame, first_title_id: int = 1) -> pd.DataFrame:
     """Create the 'Titles' table with unique IDs and clean text data."""
 
     # Select the relevant columns and create a copy
     titles = df[["Title Number", "Property Address", "Price Paid"]].copy()
 
     # Add unique ID for each title
-    titles["title_id"] = range(1, len(titles) + 1)
+    titles["title_id"] = range(first_title_id, first_title_id + len(titles))
 
     # Rename the columns
     titles = titles.rename(columns={
@@ -240,10 +416,18 @@ def create_titles_table(df: pd.DataFrame) -> pd.DataFrame:
     # Clean the data
     titles["address"] = titles["address"].apply(lambda x: re.sub(
         r"\s{2,}", " ", x.strip()).upper() if isinstance(x, str) else x)
+    titles["postcode"] = extract_postcodes(titles["address"])
 
     return titles
 
 
+def extract_postcodes(addresses: pd.Series) -> pd.Series:
+    """Extract the postcode ending each address as "OUTWARD INWARD", or None."""
+    parts = addresses.str.extract(POSTCODE_PATTERN)
+    postcodes = parts[0] + " " + parts[1]
+    return postcodes.astype(object).where(postcodes.notna(), None)
+
+
 def create_owners_table(df: pd.DataFrame) -> pd.DataFrame:
     """Create the 'Owners' table by unpivoting proprietor and country columns."""
     owners_list = []
@@ -352,109 +536,668 @@ def create_titles_owners_table(combined_data: pd.DataFrame, titles_df: pd.DataFr
     titles_owners_df["title_id"] = titles_owners_df["title_number"].map(
         title_number_to_id)
 
-    # Drop 'title_number' as it's no longer needed
-    titles_owners_df = titles_owners_df[["title_id", "owner_id"]]
+    # Drop 'title_number' as it's no longer needed. An owner listed twice on
+    # a title is linked to it once
+    titles_owners_df = titles_owners_df[[
+        "title_id", "owner_id"]].drop_duplicates()
 
     return titles_owners_df
 
 
-def save_to_db(df: pd.DataFrame, table_name: str, db_file: str):
-    """Save a DataFrame to an SQLite database and create indexes."""
+# Titles and owners are keyed on their rowid so lookups by ID need no index
+TABLE_SCHEMAS = {
+    "titles": """
+    CREATE TABLE titles (
+        title_id INTEGER PRIMARY KEY,
+        title_number TEXT,
+        address TEXT,
+        price REAL,
+        postcode TEXT
+    )
+    """,
+    "owners": """
+    CREATE TABLE owners (
+        owner_id INTEGER PRIMARY KEY,
+        owner TEXT,
+        owner_key TEXT,
+        country TEXT,
+        source TEXT,
+        title_count INTEGER
+    )
+    """,
+    # Keyed on (owner_id, title_id), the table is its own index for an
+    # owner's titles, so only the reverse direction needs a separate index
+    "titles_owners": """
+    CREATE TABLE titles_owners (
+        owner_id INTEGER,
+        title_id INTEGER,
+        PRIMARY KEY (owner_id, title_id)
+    ) WITHOUT ROWID
+    """
+}
+
+# Titles and owners get their IDs in the order they are built. Links are
+# sorted to the titles_owners key before loading
+TABLE_KEYS = {
+    "titles_owners": ["owner_id", "title_id"]
+}
+
+# Indexes are created once a table is loaded, which is faster than keeping
+# them up to date row by row. The titles_owners index covers both columns so
+# joins from titles never read the table itself
+TABLE_INDEXES = {
+    "owners": [
+        "CREATE INDEX IF NOT EXISTS idx_owners ON owners (owner)",
+        # Searches find the owner with the most titles under a key in one probe
+        "CREATE INDEX IF NOT EXISTS idx_owners_owner_key ON owners (owner_key, title_count)"
+    ],
+    "titles_owners": [
+        "CREATE INDEX IF NOT EXISTS idx_titles_owners_title_owner ON titles_owners(title_id, owner_id)"
+    ],
+    "titles": [
+        "CREATE INDEX IF NOT EXISTS idx_titles_title_number ON titles(title_number)",
+        # Postcode prefix searches are range scans, returned in (postcode, title_id) order
+        "CREATE INDEX IF NOT EXISTS idx_titles_postcode ON titles(postcode)"
+    ]
+}
+
+
+def create_table(conn, table_name):
+    """Drop a table and recreate it with its explicit schema."""
+    conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+    conn.execute(TABLE_SCHEMAS[table_name])
+
+
+def open_bulk_connection(db_file):
+    """Open a database that is being built for bulk loading.
+
+    Journaling and syncing are switched off: a build that fails part way is
+    thrown away rather than rolled back, so neither is needed.
+    """
     os.makedirs(os.path.dirname(db_file), exist_ok=True)
-
     conn = sqlite3.connect(db_file)
-    df.to_sql(table_name, conn, if_exists="replace", index=False)
-    conn.close()
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    return conn
 
-    # After saving, call create_indexes to ensure indexes are created for the table
-    create_indexes(db_file, table_name)
 
+def bulk_insert(conn, table_name, df: pd.DataFrame, batch_size=BULK_LOAD_BATCH_SIZE):
+    """Insert a DataFrame's rows with executemany, a batch at a time.
 
-def create_indexes(db_file, table_name=None):
-    """Create indexes only if the target tables exist in the database."""
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-
-    # Check if the specific tables exist
-    if table_name:
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if not cur.fetchone():
-            conn.close()
-            return
+    Missing values are stored as NULL. Nothing is committed, so a whole load
+    can run in a single transaction.
+    """
+    columns = list(df.columns)
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        conn.executemany(query, zip(*(batch[column].tolist()
+                         for column in columns)))
+
+
+def create_table_indexes(conn, table_name):
+    """Create the indexes of a table."""
+    for index in TABLE_INDEXES.get(table_name, []):
+        conn.execute(index)
 
-    # Index definitions
-    indexes = {
-        "owners": [
-            "CREATE INDEX IF NOT EXISTS idx_owners ON owners (owner)",
-            "CREATE INDEX IF NOT EXISTS idx_owners_owner_id ON owners(owner_id)"
-        ],
-        "titles_owners": [
-            "CREATE INDEX IF NOT EXISTS idx_titles_owners_owner_id ON titles_owners(owner_id)",
-            "CREATE INDEX IF NOT EXISTS idx_titles_owners_title_id ON titles_owners(title_id)"
-        ],
-        "titles": [
-            "CREATE INDEX IF NOT EXISTS idx_titles_title_id ON titles(title_id)",
-            "CREATE INDEX IF NOT EXISTS idx_titles_title_number ON titles(title_number)"
-        ]
-    }
 
-    # Apply indexes only if they are relevant to the table_name
-    relevant_indexes = indexes.get(table_name, [])
-    for index in relevant_indexes:
-        cur.execute(index)
+def save_tables(tables, db_file, stage=skip_stage):
+    """Create tables from DataFrames in one transaction, then index them.
 
-    # Commit and close
-    conn.commit()
-    conn.close()
+    Rows are inserted in primary key order, so each table is appended to
+    rather than split page by page.
+    """
+    conn = open_bulk_connection(db_file)
+    try:
+        stage("write")
+        with conn:
+            for table_name, df in tables.items():
+                create_table(conn, table_name)
+                key = TABLE_KEYS.get(table_name)
+                if key:
+                    df = df.sort_values(key)
+                bulk_insert(conn, table_name, df)
+
+        stage("index")
+        with conn:
+            for table_name in tables:
+                create_table_indexes(conn, table_name)
+    finally:
+        conn.close()
 
 
-def get_owners_list(db_file):
-    # Connect to the SQLite database and fetch owners list
+# Trigram full-text indexes over owner names and addresses. They store no
+# text of their own and read it from the tables they index
+SEARCH_INDEX_SCHEMAS = {
+    "owners_fts": """
+    CREATE VIRTUAL TABLE owners_fts USING fts5(
+        owner, content='owners', content_rowid='owner_id', tokenize='trigram'
+    )
+    """,
+    "titles_fts": """
+    CREATE VIRTUAL TABLE titles_fts USING fts5(
+        address, content='titles', content_rowid='title_id', tokenize='trigram'
+    )
+    """
+}
+
+# How many rows contain each trigram, used to leave very common trigrams out
+# of queries. Copied from fts5vocab once per build, as counting on demand
+# walks the whole index entry of the trigram. Change Only updates leave the
+# counts as they are; they only steer which trigrams are queried
+SEARCH_TERMS_SCHEMA = """
+CREATE TABLE {table_name}_terms (
+    term TEXT PRIMARY KEY,
+    doc INTEGER
+) WITHOUT ROWID
+"""
+
+# Keep the indexes in step with the Change Only updates
+SEARCH_INDEX_TRIGGERS = {
+    "owners_fts_insert": """
+    CREATE TRIGGER owners_fts_insert AFTER INSERT ON owners BEGIN
+        INSERT INTO owners_fts (rowid, owner) VALUES (new.owner_id, new.owner);
+    END
+    """,
+    "owners_fts_delete": """
+    CREATE TRIGGER owners_fts_delete AFTER DELETE ON owners BEGIN
+        INSERT INTO owners_fts (owners_fts, rowid, owner) VALUES ('delete', old.owner_id, old.owner);
+    END
+    """,
+    "titles_fts_insert": """
+    CREATE TRIGGER titles_fts_insert AFTER INSERT ON titles BEGIN
+        INSERT INTO titles_fts (rowid, address) VALUES (new.title_id, new.address);
+    END
+    """,
+    "titles_fts_delete": """
+    CREATE TRIGGER titles_fts_delete AFTER DELETE ON titles BEGIN
+        INSERT INTO titles_fts (titles_fts, rowid, address) VALUES ('delete', old.title_id, old.address);
+    END
+    """
+}
+
+
+def create_search_indexes(db_file):
+    """Rebuild the full-text indexes over owner names and addresses.
+
+    Returns the time taken in seconds, or None if this SQLite build has no
+    FTS5 trigram tokenizer.
+    """
+    started = time.perf_counter()
     conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    cursor.execute("SELECT owner FROM owners")
-    results = cursor.fetchall()
-    conn.close()
+    try:
+        with conn:
+            for trigger_name in SEARCH_INDEX_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+
+            for table_name, schema in SEARCH_INDEX_SCHEMAS.items():
+                conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+                conn.execute(f"DROP TABLE IF EXISTS {table_name}_terms")
+                conn.execute(schema)
+                conn.execute(
+                    f"INSERT INTO {table_name} ({table_name}) VALUES ('rebuild')")
+
+                conn.execute(SEARCH_TERMS_SCHEMA.format(table_name=table_name))
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE temp.{table_name}_vocab USING fts5vocab(main, {table_name}, row)")
+                conn.execute(
+                    f"INSERT INTO {table_name}_terms SELECT term, doc FROM temp.{table_name}_vocab")
+                conn.execute(f"DROP TABLE temp.{table_name}_vocab")
+
+            for trigger in SEARCH_INDEX_TRIGGERS.values():
+                conn.execute(trigger)
+    except sqlite3.OperationalError as e:
+        logger.warning("Full-text search indexes not built: %s", e)
+        return None
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    logger.info("Built full-text search indexes in %.2fs", seconds)
+    return seconds
+
+
+def add_title_counts(owners_df: pd.DataFrame, titles_owners_df: pd.DataFrame) -> pd.DataFrame:
+    """Add the number of titles held by each owner, used to rank suggestions."""
+    title_counts = titles_owners_df["owner_id"].value_counts()
+    owners_df["title_count"] = owners_df["owner_id"].map(
+        title_counts).fillna(0).astype(int)
+
+    return owners_df
 
-    # Extract the owners into a list
-    owners_list = [result[0] for result in results]
 
-    # Convert the list to a properly formatted JavaScript array syntax
-    owners_js_array = ',\n    '.join(f'"{owner}"' for owner in owners_list)
-    js_content = f'let OWNERS = [\n    {owners_js_array}\n];\n'
+def get_peak_memory_mb():
+    """Return the peak resident memory of this process in MB, if known."""
+    if resource is None:
+        return None
+
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def record_stage(stats, stage, rows, started):
+    """Accumulate rows, time and peak memory for an ingest stage."""
+    entry = stats.setdefault(stage, {"rows": 0, "seconds": 0.0})
+    entry["rows"] += rows
+    entry["seconds"] += time.perf_counter() - started
+    entry["peak_memory_mb"] = get_peak_memory_mb()
+
+
+def log_ingest_report(stats):
+    """Log rows/sec and peak memory for each ingest stage."""
+    for stage, entry in stats.items():
+        seconds = entry["seconds"]
+        rows_per_second = entry["rows"] / seconds if seconds else 0
+        logger.info("%s: %d rows in %.2fs (%.0f rows/sec), peak memory %s MB",
+                    stage, entry["rows"], entry["seconds"], rows_per_second,
+                    entry["peak_memory_mb"])
+
+
+def read_csv_in_chunks(file_path, columns, dtypes, source, memory_limit_mb):
+    """Yield chunks of a CSV sized to keep each chunk's working set under the memory limit."""
+    # Cleaning and unpivoting a chunk makes a few copies of it
+    chunk_budget = memory_limit_mb * 1024 * 1024 / 4
+    chunk_size = INGEST_PROBE_ROWS
+
+    with open_dataset_csv(file_path) as csv_file, pd.read_csv(
+            csv_file, encoding="utf-8", usecols=columns, dtype=dtypes, iterator=True) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(chunk_size)
+            except StopIteration:
+                return
+
+            # Size the following chunks from the measured bytes per row
+            bytes_per_row = chunk.memory_usage(
+                deep=True).sum() / max(len(chunk), 1)
+            chunk_size = max(INGEST_PROBE_ROWS, int(
+                chunk_budget / max(bytes_per_row, 1)))
+
+            chunk = chunk[chunk["Title Number"] != "Row Count"].copy()
+            chunk["source"] = source
+
+            # CCOD has no country columns, so align every chunk to the same layout
+            yield chunk.reindex(columns=list(DTYPE_DICT) + ["source"])
+
+
+def unpivot_owners(df: pd.DataFrame, title_ids) -> pd.DataFrame:
+    """List each title's owners one per row, in the order they appear in the file."""
+    owner_columns = [f"Proprietor Name ({i})" for i in range(1, 5)]
+    country_columns = [f"Country Incorporated ({i})" for i in range(1, 5)]
+
+    # Flattening row by row keeps the file order, so a new owner takes the
+    # country and source of the first row it is listed on
+    links = pd.DataFrame({
+        "owner": df[owner_columns].to_numpy().ravel(),
+        "country": df[country_columns].to_numpy().ravel(),
+        "source": np.repeat(df["source"].to_numpy(), len(owner_columns)),
+        "title_id": np.repeat(np.asarray(title_ids), len(owner_columns))
+    })
+    return links.dropna(subset=["owner"])
+
+
+# Owners already seen by a streaming ingest, numbered in the order they first
+# appear. They are kept in SQLite rather than in memory, so memory use stays
+# bounded by the chunk size however many owners there are
+STREAM_OWNER_TABLE_SCHEMAS = [
+    """
+    CREATE TEMP TABLE streamed_owners (
+        owner_id INTEGER PRIMARY KEY,
+        owner TEXT UNIQUE,
+        country TEXT,
+        source TEXT
+    )
+    """,
+    "CREATE TEMP TABLE chunk_owners (owner TEXT PRIMARY KEY) WITHOUT ROWID"
+]
+
+
+def write_chunk_owners(conn, chunk, titles):
+    """Assign owner IDs for a chunk and append its title/owner links."""
+    links = unpivot_owners(chunk, titles["title_id"])
+
+    # New owners take the next IDs, with the country and source of the
+    # first row they are listed on
+    chunk_owners = links.drop_duplicates(subset="owner")
+    conn.executemany(
+        "INSERT OR IGNORE INTO streamed_owners (owner, country, source) VALUES (?, ?, ?)",
+        zip(chunk_owners["owner"].tolist(), chunk_owners["country"].tolist(), chunk_owners["source"].tolist()))
+
+    conn.execute("DELETE FROM chunk_owners")
+    conn.executemany("INSERT INTO chunk_owners (owner) VALUES (?)",
+                     ((owner,) for owner in chunk_owners["owner"].tolist()))
+    owner_ids = dict(conn.execute("""
+    SELECT streamed_owners.owner, streamed_owners.owner_id
+    FROM chunk_owners
+    JOIN streamed_owners ON streamed_owners.owner = chunk_owners.owner
+    """).fetchall())
+
+    # An owner listed twice on a title is linked to it once
+    links = pd.DataFrame({"owner_id": links["owner"].map(owner_ids),
+                          "title_id": links["title_id"]}).drop_duplicates()
+    bulk_insert(conn, "titles_owners", links.sort_values(TABLE_KEYS["titles_owners"]))
+
+    return len(links)
+
+
+def stream_data_processing(files, db_file, memory_limit_mb=INGEST_MEMORY_LIMIT_MB, stage=skip_stage, progress=None):
+    """Clean and write the datasets into SQLite chunk by chunk.
+
+    Only one chunk of the input is held in memory at a time. Owners are
+    deduplicated in a temporary table, and keep the country and source of the
+    first row they appear on, so IDs can differ from the non-streaming ingest. Reading,
+    cleaning and writing are interleaved, so they are reported to `stage` as
+    a single "write" stage, with `progress(titles_written)` after each chunk.
+    """
+    stage("write")
+    conn = open_bulk_connection(db_file)
+    try:
+        for table_name in ("titles", "owners", "titles_owners"):
+            create_table(conn, table_name)
+        for schema in STREAM_OWNER_TABLE_SCHEMAS:
+            conn.execute(schema)
+
+        stats = {}
+        next_title_id = 1
+
+        for file_path, columns, source in files:
+            chunks = read_csv_in_chunks(
+                file_path, columns, DTYPE_DICT, source, memory_limit_mb)
+
+            while True:
+                started = time.perf_counter()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                record_stage(stats, "read", len(chunk), started)
+
+                started = time.perf_counter()
+                chunk = clean_owner_columns(chunk)
+                titles = create_titles_table(chunk, next_title_id)
+                record_stage(stats, "clean", len(chunk), started)
+
+                started = time.perf_counter()
+                bulk_insert(conn, "titles", titles)
+                links = write_chunk_owners(conn, chunk, titles)
+                record_stage(stats, "write", len(chunk) + links, started)
+
+                next_title_id += len(chunk)
+                if progress:
+                    progress(next_title_id - 1)
+
+        # Each owner's links are contiguous in the titles_owners key, so
+        # counting them is a range scan per owner
+        started = time.perf_counter()
+        conn.create_function("get_owner_key", 1, get_owner_key, deterministic=True)
+        owner_count = conn.execute("""
+        INSERT INTO owners (owner_id, owner, owner_key, country, source, title_count)
+        SELECT
+            owner_id,
+            owner,
+            get_owner_key(owner),
+            country,
+            source,
+            (SELECT COUNT(*) FROM titles_owners WHERE titles_owners.owner_id = streamed_owners.owner_id)
+        FROM
+            streamed_owners
+        ORDER BY
+            owner_id
+        """).rowcount
+        conn.commit()
+        record_stage(stats, "write owners", owner_count, started)
+
+        stage("index")
+        started = time.perf_counter()
+        with conn:
+            for table_name in ("titles", "owners", "titles_owners"):
+                create_table_indexes(conn, table_name)
+        record_stage(stats, "index", 0, started)
+    finally:
+        conn.close()
+
+    log_ingest_report(stats)
+    return stats
+
+
+def load_change_data(file_path, columns, dtypes, source):
+    """Load a Change Only CSV, keeping the change indicator for each row."""
+    with open_dataset_csv(file_path) as csv_file:
+        data = pd.read_csv(csv_file, encoding="utf-8",
+                           usecols=columns + ["Change Indicator"], dtype=dtypes)
+
+    filtered_data = data[data["Title Number"] != "Row Count"].copy()
+    filtered_data["source"] = source
+
+    # CCOD has no country columns, so align both datasets to the same layout
+    return filtered_data.reindex(columns=list(DTYPE_DICT) + ["source", "Change Indicator"])
 
-    # Ensure the instance/owners directory exists
-    output_dir = "static"
-    os.makedirs(output_dir, exist_ok=True)
 
-    # Write the JavaScript content to a file in the instance/owners directory
-    js_file_path = os.path.join(output_dir, "owners.js")
-    with open(js_file_path, "w") as js_file:
-        js_file.write(js_content)
+def add_owner_keys(conn):
+    """Add lookup keys to an owners table built before they existed."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(owners)")]
+    if "owner_key" in columns:
+        return
 
-    return owners_list
+    conn.execute("ALTER TABLE owners ADD COLUMN owner_key TEXT")
+    conn.executemany("UPDATE owners SET owner_key = ? WHERE owner_id = ?",
+                     ((get_owner_key(owner), owner_id) for owner_id, owner in conn.execute("SELECT owner_id, owner FROM owners").fetchall()))
+    create_table_indexes(conn, "owners")
 
 
-def finalize_data_processing():
-    # Load and process the datasets
-    ocod_df = load_data(
-        "instance/temp/ocod.csv", DATASETS_COLUMNS["ocod"], DTYPE_DICT, "OCOD")
-    ccod_df = load_data(
-        "instance/temp/ccod.csv", DATASETS_COLUMNS["ccod"], DTYPE_DICT, "CCOD")
+# Rows of a Change Only file that carry a title's current details. Every
+# other row only removes the title
+CHANGE_INDICATORS_TO_ADD = ["A", "M"]
 
-    # Concatenate and process tables
-    combined_data = concatenate(ocod_df, ccod_df)
-    titles = create_titles_table(combined_data)
-    owners = create_owners_table(combined_data)
-    titles_owners = create_titles_owners_table(combined_data, titles, owners)
+# The titles and owners an update touches, so each step is one statement
+# over all of them rather than one per row
+CHANGE_TABLE_SCHEMAS = [
+    "CREATE TEMP TABLE changed_titles (title_number TEXT PRIMARY KEY) WITHOUT ROWID",
+    "CREATE TEMP TABLE changed_owners (owner TEXT PRIMARY KEY) WITHOUT ROWID",
+    "CREATE TEMP TABLE affected_owners (owner_id INTEGER PRIMARY KEY)"
+]
 
-    # Save to database
-    save_to_db(titles, "titles", DATABASE)
-    save_to_db(owners, "owners", DATABASE)
-    save_to_db(titles_owners, "titles_owners", DATABASE)
-    get_owners_list(DATABASE)
+
+def apply_change_only_updates(files, db_file):
+    """Apply Change Only files to the existing tables in a single transaction.
+
+    Every title in the files is removed first, with its links. Rows marked
+    "A" or "M" are then added back, keeping the title's previous ID if it
+    had one, so a changed title ends up with its new details and owners.
+    Owners left without titles are dropped. Returns the number of titles
+    changed.
+    """
+    changes = pd.concat([load_change_data(file_path, columns, DTYPE_DICT, source)
+                         for file_path, columns, source in files], ignore_index=True)
+    changes = clean_owner_columns(changes)
+    changed_title_numbers = changes["Title Number"].dropna().unique().tolist()
+
+    # A title listed more than once takes its last row
+    changes = changes[changes["Change Indicator"].isin(CHANGE_INDICATORS_TO_ADD)
+                      & ~changes["Title Number"].duplicated(keep="last")]
+    added_titles = create_titles_table(changes)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        with conn:
+            add_owner_keys(conn)
+            add_statistics(conn)
+
+            for schema in CHANGE_TABLE_SCHEMAS:
+                conn.execute(schema)
+            conn.executemany("INSERT OR IGNORE INTO temp.changed_titles (title_number) VALUES (?)",
+                             ((title_number,) for title_number in changed_title_numbers))
+
+            # Remove the current version of every changed title. Links go
+            # first, so the statistics triggers can still read the price
+            removed_titles = "SELECT title_id FROM titles WHERE title_number IN (SELECT title_number FROM temp.changed_titles)"
+            previous_title_ids = dict(conn.execute(
+                "SELECT title_number, MIN(title_id) FROM titles WHERE title_number IN (SELECT title_number FROM temp.changed_titles) GROUP BY title_number").fetchall())
+            last_title_id = conn.execute(
+                "SELECT COALESCE(MAX(title_id), 0) FROM titles").fetchone()[0]
+            conn.execute(
+                f"INSERT OR IGNORE INTO temp.affected_owners (owner_id) SELECT owner_id FROM titles_owners WHERE title_id IN ({removed_titles})")
+            conn.execute(
+                f"DELETE FROM titles_owners WHERE title_id IN ({removed_titles})")
+            conn.execute(f"DELETE FROM titles WHERE title_id IN ({removed_titles})")
+
+            # Add the new version of every added title, numbering new titles on from the last ID
+            title_ids = added_titles["title_number"].map(previous_title_ids)
+            is_new = title_ids.isna()
+            title_ids[is_new] = range(
+                last_title_id + 1, last_title_id + 1 + is_new.sum())
+            added_titles["title_id"] = title_ids.astype(int)
+
+            # Use None rather than NaN so that SQLite stores NULL
+            bulk_insert(conn, "titles", added_titles.astype(
+                object).where(added_titles.notna(), None))
+
+            # Add owners seen for the first time, then every link
+            links = unpivot_owners(changes, added_titles["title_id"])
+            conn.executemany("INSERT OR IGNORE INTO temp.changed_owners (owner) VALUES (?)",
+                             ((owner,) for owner in links["owner"].unique().tolist()))
+            owner_ids = dict(conn.execute(
+                "SELECT owner, MIN(owner_id) FROM owners WHERE owner IN (SELECT owner FROM temp.changed_owners) GROUP BY owner").fetchall())
+
+            last_owner_id = conn.execute(
+                "SELECT COALESCE(MAX(owner_id), 0) FROM owners").fetchone()[0]
+            new_owners = links[~links["owner"].isin(owner_ids)].drop_duplicates(subset="owner")
+            new_owners = pd.DataFrame({
+                "owner_id": range(last_owner_id + 1, last_owner_id + 1 + len(new_owners)),
+                "owner": new_owners["owner"],
+                "owner_key": new_owners["owner"].map(get_owner_key),
+                "country": new_owners["country"],
+                "source": new_owners["source"],
+                "title_count": 0
+            })
+            bulk_insert(conn, "owners", new_owners.astype(
+                object).where(new_owners.notna(), None))
+            owner_ids.update(zip(new_owners["owner"], new_owners["owner_id"]))
+
+            # An owner listed twice on a title is linked to it once
+            links = pd.DataFrame({"owner_id": links["owner"].map(owner_ids),
+                                  "title_id": links["title_id"]}).drop_duplicates()
+            bulk_insert(conn, "titles_owners",
+                        links.sort_values(TABLE_KEYS["titles_owners"]))
+            conn.executemany("INSERT OR IGNORE INTO temp.affected_owners (owner_id) VALUES (?)",
+                             ((owner_id,) for owner_id in links["owner_id"].unique().tolist()))
+
+            # Refresh title counts and drop owners that no longer hold any titles
+            conn.execute("""
+            UPDATE owners
+            SET title_count = (SELECT COUNT(*) FROM titles_owners WHERE titles_owners.owner_id = owners.owner_id)
+            WHERE owner_id IN (SELECT owner_id FROM temp.affected_owners)
+            """)
+            conn.execute(
+                "DELETE FROM owners WHERE owner_id IN (SELECT owner_id FROM temp.affected_owners) AND title_count = 0")
+
+            for table_name in ("changed_titles", "changed_owners", "affected_owners"):
+                conn.execute(f"DROP TABLE temp.{table_name}")
+    finally:
+        conn.close()
+
+    return len(changed_title_numbers)
+
+
+def get_dataset_files():
+    """Return the zip path, columns and source of each downloaded dataset."""
+    return [(get_zip_path(dataset), columns, dataset.upper())
+            for dataset, columns in DATASETS_COLUMNS.items()]
+
+
+def build_database(db_file, download_option, files, datasets=None, stage=skip_stage, progress=None):
+    """Build the tables and indexes for a download into the given database file.
+
+    `stage(name)` is called as each stage of the build starts.
+    """
+    if download_option == "update":
+        # Change Only files are applied to a copy of the live database
+        stage("write")
+        copy_database(DATABASE, db_file)
+        apply_change_only_updates(files, db_file)
+    elif STREAMING_INGEST:
+        stream_data_processing(files, db_file, stage=stage, progress=progress)
+    else:
+        # Load and process any dataset not already parsed during download
+        stage("parse")
+        datasets = datasets or {}
+        ocod_df = datasets.get("ocod")
+        if ocod_df is None:
+            ocod_df = load_data(
+                get_zip_path("ocod"), DATASETS_COLUMNS["ocod"], DTYPE_DICT, "OCOD")
+        ccod_df = datasets.get("ccod")
+        if ccod_df is None:
+            ccod_df = load_data(
+                get_zip_path("ccod"), DATASETS_COLUMNS["ccod"], DTYPE_DICT, "CCOD")
+
+        # Concatenate and process tables
+        stage("normalise")
+        combined_data = concatenate(ocod_df, ccod_df)
+        titles = create_titles_table(combined_data)
+        owners = create_owners_table(combined_data)
+        titles_owners = create_titles_owners_table(
+            combined_data, titles, owners)
+        owners = add_title_counts(owners, titles_owners)
+        owners["owner_key"] = owners["owner"].map(get_owner_key)
+
+        # Save to database
+        save_tables({"titles": titles, "owners": owners,
+                    "titles_owners": titles_owners}, db_file, stage)
+
+    # Change Only updates keep the search indexes and summary statistics
+    # current through triggers
+    if download_option != "update":
+        stage("search index")
+        create_search_indexes(db_file)
+        stage("statistics")
+        build_statistics(db_file)
+
+    # The co-ownership graph is rebuilt from the final links either way
+    stage("graph")
+    build_owner_graph(db_file)
+
+
+def finalize_data_processing(download_option="latest", datasets=None, stage=skip_stage, progress=None):
+    """Build a new database snapshot from the downloaded files and start serving it.
+
+    The live database is never written to: searches keep using it until the
+    new snapshot has been checked and swapped in. If `stage` raises, the
+    build stops and the snapshot is removed.
+    """
+    files = get_dataset_files()
+    snapshot_path = create_snapshot_path()
+
+    try:
+        build_database(snapshot_path, download_option,
+                       files, datasets, stage, progress)
+        stamp_snapshot(snapshot_path)
+        stage("validate")
+        validate_snapshot(snapshot_path)
+
+        # Full releases are also merged into the ownership history
+        if RECORD_HISTORY and download_option != "update":
+            stage("history")
+            release_month = next(filter(None, (get_release_month(file_path)
+                                               for file_path, _, _ in files)), None)
+            if release_month:
+                record_release(snapshot_path, release_month)
+            else:
+                logger.warning(
+                    "No release month in the file names, so the history was not updated")
+
+        # A columnar copy of the tables for analysts, if pyarrow is installed
+        if EXPORT_ANALYTICS:
+            stage("export")
+            export_snapshot(snapshot_path)
+
+        stage("swap")
+    except Exception:
+        remove_files(snapshot_path, f"{snapshot_path}-journal")
+        remove_export(snapshot_path)
+        raise
+
+    activate_snapshot(snapshot_path)
+    prune_snapshots()
+    prune_exports()
 
     # Clean up
-    os.remove("instance/temp/ocod.csv")
-    os.remove("instance/temp/ccod.csv")
+    remove_files(*(file_path for file_path, _, _ in files))
@@ -1,18 +1,140 @@
 from fpdf import FPDF
 import os
-import shutil
 import csv
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+import importlib.util
+from itertools import islice
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from constants import CSV_STREAM_BATCH_ROWS
+from functions.company_search_helpers import format_price
+
+
+def get_export_path(search_type, query, dataset_version, extension, file_directory):
+    """Return the cache path of an export, addressed by its query and dataset version."""
+    os.makedirs(file_directory, exist_ok=True)
+    key = hashlib.sha256(
+        f"{search_type}\0{query}\0{dataset_version}".encode("utf-8")).hexdigest()
+    return os.path.join(file_directory, f"{key}{extension}")
+
+
+def create_export_token(secret_key, search_type, query):
+    """Sign a token that lets the results of one search be exported until it expires."""
+    return URLSafeTimedSerializer(secret_key, salt="export").dumps([search_type, query])
+
+
+def check_export_token(secret_key, token, search_type, query, max_age):
+    """Return whether a token was issued for this search and has not expired."""
+    try:
+        issued_for = URLSafeTimedSerializer(secret_key, salt="export").loads(
+            token or "", max_age=max_age)
+    except BadSignature:
+        return False
+
+    return issued_for == [search_type, query]
 
 
-def reset(file_directory):
-    if os.path.exists(file_directory):
-        shutil.rmtree(file_directory)
-        os.makedirs(file_directory, exist_ok=True)
+def open_cached_export(file_path):
+    """Open a cached export and mark it as recently used, or return None.
 
+    The open handle keeps the file readable even if the janitor deletes it
+    while it is being sent.
+    """
+    try:
+        export_file = open(file_path, "rb")
+    except FileNotFoundError:
+        return None
 
-def create_file_names(query, file_directory):
-    os.makedirs(file_directory, exist_ok=True)
-    return (fr"{file_directory}/{query}.pdf", fr"{file_directory}/{query}.csv")
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+    return export_file
+
+
+def write_export(file_path, write):
+    """Write an export to a temporary file, move it into place and return it opened.
+
+    The file is opened before it is moved, so it stays readable even if the
+    janitor evicts it straight away.
+    """
+    file_directory, file_name = os.path.split(file_path)
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=file_directory, prefix=".", suffix=os.path.splitext(file_name)[1])
+    os.close(file_descriptor)
+
+    try:
+        write(temp_path)
+        export_file = open(temp_path, "rb")
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return export_file
+
+
+def clean_exports(file_directory, ttl_seconds, max_bytes):
+    """Delete exports older than the TTL, then the least recently used until the cache fits."""
+    if not os.path.isdir(file_directory):
+        return
+
+    expires_before = time.time() - ttl_seconds
+    exports = []
+    for entry in os.scandir(file_directory):
+        if not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+
+        # Leftover temporary files are only removed once they have expired
+        if stat.st_mtime < expires_before:
+            remove_export(entry.path)
+        elif not entry.name.startswith("."):
+            exports.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in exports)
+    for _, size, file_path in sorted(exports):
+        if total_bytes <= max_bytes:
+            break
+        remove_export(file_path)
+        total_bytes -= size
+
+
+def remove_export(file_path):
+    """Delete an export, ignoring files already gone or still open elsewhere."""
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def start_export_janitor(file_directory, ttl_seconds, max_bytes, interval_seconds):
+    """Start a background thread that cleans the export cache every interval."""
+    global _janitor
+
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            clean_exports(file_directory, ttl_seconds, max_bytes)
+
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = threading.Thread(
+                target=run, name="export-janitor", daemon=True)
+            _janitor.start()
+
+    return _janitor
 
 
 def create_pdf(company, incorporation_statement, number_of_properties, titles, filename):
@@ -52,43 +174,6 @@ def create_pdf(company, incorporation_statement, number_of_properties, titles, f
     return pdf.output(filename)
 
 
-def create_csv(titles, filename):
-
-    # Prepare data for CSV
-    header = ["Title number", "Address", "price"]
-
-    with open(filename, mode="w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(header)
-
-        for title in titles:
-            writer.writerow([
-                title["title_number"],
-                title["address"],
-                title["price"],
-            ])
-
-
-def export_result_as_files(company, incorporation_statement, number_of_properties, titles, file_directory):
-    output_pdf_file_name, output_csv_file_name = create_file_names(
-        company, file_directory)
-    create_pdf(company, incorporation_statement,
-               number_of_properties, titles, output_pdf_file_name)
-    create_csv(titles, output_csv_file_name)
-
-
-def find_file_by_extension(directory, extension):
-    # List all files in the specified directory
-    for filename in os.listdir(directory):
-        # Check if the file has the specified extension (e.g., .pdf or .csv)
-        if filename.endswith(extension):
-            file_path = os.path.join(directory, filename)
-            return file_path  # Return the full path of the file
-
-    # If no file with the given extension is found, return None
-    return None
-
-
 def create_titles_result_pdf(title_number, formatted_title_details, owners, filename):
     pdf = FPDF()
     pdf.add_page()  # Add a page before adding content
@@ -128,25 +213,123 @@ def create_titles_result_pdf(title_number, formatted_title_details, owners, file
     return pdf.output(filename)
 
 
-def create_titles_result_csv(owners, filename):
+def iter_csv(header, rows):
+    """Yield CSV text for a header and rows, a batch of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row_number, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if row_number % CSV_STREAM_BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
 
-    # Prepare data for CSV
+    yield buffer.getvalue()
+
+
+def iter_ndjson(records):
+    """Yield each record as a line of JSON."""
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def iter_company_search_csv(titles):
+    """Yield a company search CSV from (title number, address, price) rows."""
     header = ["Title number", "Address", "price"]
+    rows = ([title_number, address, format_price(price)]
+            for title_number, address, price in titles)
+    return iter_csv(header, rows)
 
-    with open(filename, mode="w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(header)
 
-        for owner in owners:
-            writer.writerow([
-                owner["company"],
-                owner["country"]
-            ])
-
-
-def export_title_search_result_as_files(title_number, formatted_title_details, owners, file_directory):
-    output_pdf_file_name, output_csv_file_name = create_file_names(
-        title_number, file_directory)
-    create_titles_result_pdf(
-        title_number, formatted_title_details, owners, output_pdf_file_name)
-    create_titles_result_csv(owners, output_csv_file_name)
+def iter_title_search_csv(owners):
+    """Yield a title search CSV from formatted owners."""
+    header = ["Title number", "Address", "price"]
+    rows = ([owner["company"], owner["country"]] for owner in owners)
+    return iter_csv(header, rows)
+
+
+def bulk_title_results_to_rows(results):
+    """Flatten bulk title results into one CSV row per title and owner."""
+    for title in results:
+        for owner in title["owners"] or [None]:
+            yield [
+                title["title_number"],
+                title["address"],
+                title["price"],
+                owner["company"] if owner else None,
+                owner["country"] if owner else None,
+                owner["source"] if owner else None,
+            ]
+
+
+def iter_bulk_title_results(results, output_format):
+    """Yield bulk title results as CSV or NDJSON text."""
+    if output_format == "ndjson":
+        return iter_ndjson(results)
+
+    header = ["Title number", "Address", "Price", "Company", "Country", "Source"]
+    return iter_csv(header, bulk_title_results_to_rows(results))
+
+
+# Column names and Arrow types of bulk company results
+BULK_COMPANY_FIELDS = [
+    ("query", "string"),
+    ("found", "bool"),
+    ("owner", "string"),
+    ("country", "string"),
+    ("source", "string"),
+    ("title_number", "string"),
+    ("address", "string"),
+    ("price", "double")
+]
+
+
+def parquet_available():
+    """Return whether the optional pyarrow dependency is installed."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def iter_parquet(records, fields):
+    """Yield a Parquet file of records, written a batch of rows at a time.
+
+    Parquet needs a footer once every row group is written, so the file is
+    built in a temporary file and then streamed out of it.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.type_for_alias(type_name))
+                        for name, type_name in fields])
+    records = iter(records)
+
+    with tempfile.TemporaryFile() as parquet_file:
+        with pq.ParquetWriter(parquet_file, schema) as writer:
+            while True:
+                batch = list(islice(records, CSV_STREAM_BATCH_ROWS))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+        parquet_file.seek(0)
+        while True:
+            chunk = parquet_file.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_bulk_company_results(results, output_format):
+    """Yield bulk company results as CSV or NDJSON text, or Parquet bytes."""
+    if output_format == "ndjson":
+        return iter_ndjson(results)
+
+    if output_format == "parquet":
+        return iter_parquet(results, BULK_COMPANY_FIELDS)
+
+    header = ["Query", "Found", "Owner", "Country",
+              "Source", "Title number", "Address", "Price"]
+    rows = ([result[name] for name, _ in BULK_COMPANY_FIELDS]
+            for result in results)
+    return iter_csv(header, rows)
@@ -0,0 +1,231 @@
+import re
+import sqlite3
+from constants import FULL_TEXT_CANDIDATES, FULL_TEXT_FUZZY_TRIGRAMS, FULL_TEXT_MAX_TERM_DOCS
+from functions.company_search_helpers import format_price
+from functions.database_helpers import get_read_connection
+from functions.normalise_helpers import clean_owner_data
+from functions.title_search_helpers import format_owner_country
+
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+|[&@£$€¥#]")
+
+# The trigram tokenizer cannot match terms shorter than one trigram
+MIN_TERM_LENGTH = 3
+
+
+def get_search_terms(text):
+    """Split text into terms of at least three characters.
+
+    Short tokens are joined to the token after them, so "E1 6AN" stays a
+    single term and "1 HIGH STREET" becomes "1 HIGH" and "STREET".
+    """
+    terms = []
+    pending = []
+    for token in TOKEN_PATTERN.findall(text.upper()):
+        pending.append(token)
+        term = " ".join(pending)
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append(term)
+            pending = []
+
+    if pending:
+        if terms:
+            terms[-1] = f"{terms[-1]} {' '.join(pending)}"
+        elif len(" ".join(pending)) >= MIN_TERM_LENGTH:
+            terms.append(" ".join(pending))
+
+    return terms
+
+
+def get_trigrams(text):
+    """Return the trigrams of each token in the text."""
+    return {token[i:i + 3]
+            for token in TOKEN_PATTERN.findall(text.upper())
+            for i in range(len(token) - 2)}
+
+
+def get_term_trigrams(term):
+    """Return the trigrams the trigram tokenizer indexes for a term, case-folded."""
+    term = term.lower()
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def quote_term(term):
+    """Quote a term as an FTS5 string."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def trigram_similarity(query_trigrams, text):
+    """Score how well text matches a query's trigrams.
+
+    Returns the share of the query's trigrams found in the text, then the
+    Jaccard similarity of the two, so closer matches with fewer extra words
+    come first among equally complete ones.
+    """
+    text_trigrams = get_trigrams(text)
+    if not query_trigrams or not text_trigrams:
+        return 0.0, 0.0
+
+    shared = len(query_trigrams & text_trigrams)
+    return shared / len(query_trigrams), shared / len(query_trigrams | text_trigrams)
+
+
+def get_trigram_docs(cursor, fts_table, trigrams):
+    """Return the number of rows containing each trigram, from the stored term counts."""
+    trigrams = list(trigrams)
+    placeholders = ", ".join("?" for _ in trigrams)
+    query = f"""
+    SELECT
+        term,
+        doc
+    FROM
+        {fts_table}_terms
+    WHERE
+        term IN ({placeholders})
+    """
+    cursor.execute(query, trigrams)
+    docs = dict.fromkeys(trigrams, 0)
+    docs.update(cursor.fetchall())
+    return docs
+
+
+def match_fts(cursor, fts_table, match, limit, ranked=False):
+    """Return the rowids of up to `limit` rows matching an FTS5 query."""
+    query = f"""
+    SELECT
+        rowid
+    FROM
+        {fts_table}
+    WHERE
+        {fts_table} MATCH ?
+    {"ORDER BY rank" if ranked else ""}
+    LIMIT ?
+    """
+    cursor.execute(query, (match, limit))
+    return [rowid for (rowid,) in cursor.fetchall()]
+
+
+def find_candidates(cursor, fts_table, text, limit):
+    """Return the rowids of rows containing every term, then of rows sharing rare trigrams.
+
+    The second group is only looked up if the first has fewer than `limit`
+    rows, to allow for misspellings. Trigrams found in more than
+    FULL_TEXT_MAX_TERM_DOCS rows (the ones in "LIMITED", say) are left out
+    of it, so bm25 never has to score most of the table.
+    """
+    terms = get_search_terms(text)
+    if not terms:
+        return [], []
+
+    matched = match_fts(cursor, fts_table, " AND ".join(
+        quote_term(term) for term in terms), FULL_TEXT_CANDIDATES)
+    if len(matched) >= limit:
+        return matched, []
+
+    docs = get_trigram_docs(cursor, fts_table, set().union(
+        *(get_term_trigrams(term) for term in terms)))
+    rare_trigrams = sorted((trigram for trigram, doc in docs.items() if 0 < doc <= FULL_TEXT_MAX_TERM_DOCS),
+                           key=docs.get)[:FULL_TEXT_FUZZY_TRIGRAMS]
+    if not rare_trigrams:
+        return matched, []
+
+    fuzzy = match_fts(cursor, fts_table, " OR ".join(
+        quote_term(trigram) for trigram in rare_trigrams), FULL_TEXT_CANDIDATES, ranked=True)
+    matched_ids = set(matched)
+    return matched, [rowid for rowid in fuzzy if rowid not in matched_ids]
+
+
+def rank_matches(cursor, fts_table, text, limit, fetch_rows, get_text, get_weight):
+    """Find up to `limit` rows matching the text, best match first.
+
+    Rows containing every term come before rows that only share trigrams
+    with the text. Each group is ordered by trigram similarity to the text,
+    then by weight.
+    """
+    try:
+        matched, fuzzy = find_candidates(cursor, fts_table, text, limit)
+        groups = [fetch_rows(cursor, matched), fetch_rows(cursor, fuzzy)]
+    except sqlite3.OperationalError:
+        # The database was built before the search indexes existed
+        return []
+
+    query_trigrams = get_trigrams(text)
+    rows = []
+    for group in groups:
+        group.sort(key=lambda row: (*trigram_similarity(query_trigrams, get_text(row)), get_weight(row)),
+                   reverse=True)
+        rows += group
+
+    return rows[:limit]
+
+
+def fetch_owners(cursor, owner_ids):
+    """Fetch owners by ID, keeping the order of the IDs."""
+    if not owner_ids:
+        return []
+
+    placeholders = ", ".join("?" for _ in owner_ids)
+    query = f"""
+    SELECT
+        owner_id,
+        owner,
+        country,
+        source,
+        title_count
+    FROM
+        owners
+    WHERE
+        owner_id IN ({placeholders})
+    """
+    cursor.execute(query, owner_ids)
+    owners = {row[0]: row[1:] for row in cursor.fetchall()}
+    return [owners[owner_id] for owner_id in owner_ids if owner_id in owners]
+
+
+def search_owners(database, text, limit):
+    """Return the owners best matching the text, allowing for gaps and misspellings."""
+    cursor = get_read_connection(database).cursor()
+    try:
+        owners = rank_matches(cursor, "owners_fts", clean_owner_data(text), limit,
+                              fetch_owners, lambda row: row[0], lambda row: row[3] or 0)
+    finally:
+        cursor.close()
+
+    return [{"owner": owner, "country": format_owner_country(country, source),
+             "source": source, "title_count": title_count}
+            for owner, country, source, title_count in owners]
+
+
+def fetch_titles(cursor, title_ids):
+    """Fetch titles by ID, keeping the order of the IDs."""
+    if not title_ids:
+        return []
+
+    placeholders = ", ".join("?" for _ in title_ids)
+    query = f"""
+    SELECT
+        title_id,
+        title_number,
+        address,
+        price
+    FROM
+        titles
+    WHERE
+        title_id IN ({placeholders})
+    """
+    cursor.execute(query, title_ids)
+    titles = {row[0]: row[1:] for row in cursor.fetchall()}
+    return [titles[title_id] for title_id in title_ids if title_id in titles]
+
+
+def search_addresses(database, text, limit):
+    """Return the titles whose addresses best match the text."""
+    cursor = get_read_connection(database).cursor()
+    try:
+        titles = rank_matches(cursor, "titles_fts", text, limit,
+                              fetch_titles, lambda row: row[1] or "", lambda row: 0)
+    finally:
+        cursor.close()
+
+    return [{"title_number": title_number, "address": address, "price": format_price(price)}
+            for title_number, address, price in titles]
@@ -0,0 +1,350 @@
+import os
+import re
+import sqlite3
+import logging
+import time
+from constants import HISTORY_DATABASE
+from functions.database_helpers import get_read_connection
+from functions.normalise_helpers import get_owner_key
+
+
+logger = logging.getLogger(__name__)
+
+MONTH_PATTERN = re.compile(r"^(\d{4})-(\d{2})$")
+
+# Ownership is stored as intervals of release months rather than as a copy of
+# every release. An interval runs from the first release a title/owner pair
+# appears in up to (not including) the first later release it is missing
+# from. valid_to is NULL while the pair is in the latest release. Months are
+# stored as YYYYMM integers
+HISTORY_SCHEMAS = [
+    """
+    CREATE TABLE IF NOT EXISTS releases (
+        month INTEGER PRIMARY KEY,
+        title_count INTEGER,
+        ingested_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS history_titles (
+        title_key INTEGER PRIMARY KEY,
+        title_number TEXT UNIQUE,
+        address TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS history_owners (
+        owner_key INTEGER PRIMARY KEY,
+        owner TEXT UNIQUE,
+        name_key TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ownership_intervals (
+        title_key INTEGER,
+        owner_key INTEGER,
+        valid_from INTEGER,
+        valid_to INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_intervals_title ON ownership_intervals (title_key, owner_key, valid_from)",
+    "CREATE INDEX IF NOT EXISTS idx_intervals_owner ON ownership_intervals (owner_key, valid_from)",
+    "CREATE INDEX IF NOT EXISTS idx_intervals_valid_from ON ownership_intervals (valid_from)"
+]
+
+# Owners are looked up by the key get_owner_key makes of their name, as in
+# the live database
+HISTORY_NAME_KEY_INDEX = "CREATE INDEX IF NOT EXISTS idx_history_owners_name_key ON history_owners (name_key)"
+
+
+def parse_month(text):
+    """Turn "YYYY-MM" into a YYYYMM integer, or None if it is not a valid month."""
+    match = MONTH_PATTERN.match(text or "")
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return None
+
+    return int(match.group(1)) * 100 + int(match.group(2))
+
+
+def format_month(month):
+    """Turn a YYYYMM integer back into "YYYY-MM"."""
+    return f"{month // 100}-{month % 100:02d}" if month else None
+
+
+def open_history_database(history_db=HISTORY_DATABASE):
+    """Open the history database for writing, creating its tables if needed."""
+    os.makedirs(os.path.dirname(history_db), exist_ok=True)
+    conn = sqlite3.connect(history_db)
+
+    # Let searches keep reading while a release is recorded
+    conn.execute("PRAGMA journal_mode = WAL")
+    for schema in HISTORY_SCHEMAS:
+        conn.execute(schema)
+    add_name_keys(conn)
+    return conn
+
+
+def add_name_keys(conn):
+    """Add lookup keys to a history recorded before they existed, and index them."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(history_owners)")]
+    if "name_key" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE history_owners ADD COLUMN name_key TEXT")
+            conn.executemany("UPDATE history_owners SET name_key = ? WHERE owner_key = ?",
+                             ((get_owner_key(owner), owner_key) for owner_key, owner in conn.execute("SELECT owner_key, owner FROM history_owners").fetchall()))
+    conn.execute(HISTORY_NAME_KEY_INDEX)
+
+
+def record_release(snapshot_db, month, history_db=HISTORY_DATABASE):
+    """Merge the ownership in a built snapshot into the history as the release for `month`.
+
+    Releases can be recorded in any order. Only intervals that the new
+    release splits, extends or starts are written, so the history grows with
+    ownership changes rather than with the number of releases. A month that
+    has already been recorded is skipped. Returns whether it was recorded.
+    """
+    started = time.perf_counter()
+    conn = open_history_database(history_db)
+    try:
+        if conn.execute("SELECT 1 FROM releases WHERE month = ?", (month,)).fetchone():
+            logger.info("Release %s is already in the history",
+                        format_month(month))
+            return False
+
+        conn.execute("ATTACH DATABASE ? AS snapshot", (snapshot_db,))
+        with conn:
+            next_month = conn.execute(
+                "SELECT MIN(month) FROM releases WHERE month > ?", (month,)).fetchone()[0]
+
+            conn.execute(
+                "INSERT OR IGNORE INTO history_titles (title_number) SELECT title_number FROM snapshot.titles")
+            conn.execute(
+                "INSERT OR IGNORE INTO history_owners (owner, name_key) SELECT owner, owner_key FROM snapshot.owners")
+
+            # Keep the most recent address of each title
+            if next_month is None:
+                conn.execute("""
+                UPDATE history_titles
+                SET address = (SELECT address FROM snapshot.titles WHERE snapshot.titles.title_number = history_titles.title_number)
+                WHERE title_number IN (SELECT title_number FROM snapshot.titles)
+                """)
+
+            conn.execute("DROP TABLE IF EXISTS temp.release_pairs")
+            conn.execute("""
+            CREATE TEMP TABLE release_pairs (
+                title_key INTEGER,
+                owner_key INTEGER,
+                PRIMARY KEY (title_key, owner_key)
+            ) WITHOUT ROWID
+            """)
+            conn.execute("""
+            INSERT OR IGNORE INTO temp.release_pairs
+            SELECT
+                history_titles.title_key,
+                history_owners.owner_key
+            FROM
+                snapshot.titles
+            JOIN
+                snapshot.titles_owners ON snapshot.titles_owners.title_id = snapshot.titles.title_id
+            JOIN
+                snapshot.owners ON snapshot.owners.owner_id = snapshot.titles_owners.owner_id
+            JOIN
+                history_titles ON history_titles.title_number = snapshot.titles.title_number
+            JOIN
+                history_owners ON history_owners.owner = snapshot.owners.owner
+            """)
+
+            parameters = {"month": month, "next_month": next_month}
+            not_in_release = """
+            NOT EXISTS (
+                SELECT 1 FROM temp.release_pairs
+                WHERE release_pairs.title_key = ownership_intervals.title_key
+                AND release_pairs.owner_key = ownership_intervals.owner_key
+            )
+            """
+
+            # Pairs missing from this release end here. Ones that reappear
+            # in the next release carry on from there
+            conn.execute(f"""
+            INSERT INTO ownership_intervals (title_key, owner_key, valid_from, valid_to)
+            SELECT title_key, owner_key, :next_month, valid_to
+            FROM ownership_intervals
+            WHERE :next_month IS NOT NULL
+            AND valid_from < :month
+            AND (valid_to IS NULL OR valid_to > :next_month)
+            AND {not_in_release}
+            """, parameters)
+            conn.execute(f"""
+            UPDATE ownership_intervals
+            SET valid_to = :month
+            WHERE valid_from < :month
+            AND (valid_to IS NULL OR valid_to > :month)
+            AND {not_in_release}
+            """, parameters)
+
+            # Pairs first seen in the next release were already held in this one
+            conn.execute(f"""
+            UPDATE ownership_intervals
+            SET valid_from = :month
+            WHERE valid_from = :next_month
+            AND NOT {not_in_release}
+            """, parameters)
+
+            # Anything else in this release starts a new interval
+            conn.execute("""
+            INSERT INTO ownership_intervals (title_key, owner_key, valid_from, valid_to)
+            SELECT title_key, owner_key, :month, :next_month
+            FROM temp.release_pairs
+            WHERE NOT EXISTS (
+                SELECT 1 FROM ownership_intervals
+                WHERE ownership_intervals.title_key = release_pairs.title_key
+                AND ownership_intervals.owner_key = release_pairs.owner_key
+                AND ownership_intervals.valid_from <= :month
+                AND (ownership_intervals.valid_to IS NULL OR ownership_intervals.valid_to > :month)
+            )
+            """, parameters)
+
+            conn.execute(
+                "INSERT INTO releases (month, title_count, ingested_at) VALUES (?, (SELECT COUNT(*) FROM snapshot.titles), datetime('now'))",
+                (month,))
+            conn.execute("DROP TABLE temp.release_pairs")
+
+        conn.execute("DETACH DATABASE snapshot")
+    finally:
+        conn.close()
+
+    logger.info("Recorded release %s in the history in %.2fs",
+                format_month(month), time.perf_counter() - started)
+    return True
+
+
+def get_releases(history_db=HISTORY_DATABASE):
+    """Return the recorded release months, oldest first."""
+    if not os.path.exists(history_db):
+        return []
+
+    cursor = get_read_connection(history_db).cursor()
+    cursor.execute("SELECT month FROM releases ORDER BY month")
+    result = [month for (month,) in cursor.fetchall()]
+    cursor.close()
+    return result
+
+
+def get_title_owners_at(title_number, month, history_db=HISTORY_DATABASE):
+    """Return the owners of a title in the latest release on or before `month`."""
+    cursor = get_read_connection(history_db).cursor()
+    query = """
+    SELECT
+        history_owners.owner,
+        ownership_intervals.valid_from,
+        ownership_intervals.valid_to
+    FROM
+        history_titles
+    JOIN
+        ownership_intervals ON ownership_intervals.title_key = history_titles.title_key
+    JOIN
+        history_owners ON history_owners.owner_key = ownership_intervals.owner_key
+    WHERE
+        history_titles.title_number = ?
+        AND ownership_intervals.valid_from <= ?
+        AND (ownership_intervals.valid_to IS NULL OR ownership_intervals.valid_to > ?)
+    ORDER BY
+        history_owners.owner
+    """
+    cursor.execute(query, (title_number, month, month))
+    result = cursor.fetchall()
+    cursor.close()
+
+    return [{"owner": owner, "held_from": format_month(valid_from), "held_until": format_month(valid_to)}
+            for owner, valid_from, valid_to in result]
+
+
+def get_title_history(title_number, history_db=HISTORY_DATABASE):
+    """Return every ownership interval of a title, oldest first."""
+    cursor = get_read_connection(history_db).cursor()
+    query = """
+    SELECT
+        history_owners.owner,
+        ownership_intervals.valid_from,
+        ownership_intervals.valid_to
+    FROM
+        history_titles
+    JOIN
+        ownership_intervals ON ownership_intervals.title_key = history_titles.title_key
+    JOIN
+        history_owners ON history_owners.owner_key = ownership_intervals.owner_key
+    WHERE
+        history_titles.title_number = ?
+    ORDER BY
+        ownership_intervals.valid_from,
+        history_owners.owner
+    """
+    cursor.execute(query, (title_number,))
+    result = cursor.fetchall()
+    cursor.close()
+
+    return [{"owner": owner, "held_from": format_month(valid_from), "held_until": format_month(valid_to)}
+            for owner, valid_from, valid_to in result]
+
+
+def get_owner_changes(owner, start_month, end_month, history_db=HISTORY_DATABASE):
+    """Return the titles an owner acquired or disposed of between two months, inclusive.
+
+    A title counts as acquired in the first release it appears in for the
+    owner, except in the earliest release, where there is nothing to compare
+    against. It counts as disposed of in the first release it is missing from.
+    The owner is matched by get_owner_key, so differences in case, spacing,
+    punctuation and "LTD" do not matter. Returns None if the history was
+    recorded before owners had lookup keys; recording the next release adds
+    them.
+    """
+    first_month = min(get_releases(history_db), default=None)
+    cursor = get_read_connection(history_db).cursor()
+    query = """
+    SELECT
+        'acquired' AS change,
+        ownership_intervals.valid_from AS month,
+        history_titles.title_number,
+        history_titles.address
+    FROM
+        history_owners
+    JOIN
+        ownership_intervals ON ownership_intervals.owner_key = history_owners.owner_key
+    JOIN
+        history_titles ON history_titles.title_key = ownership_intervals.title_key
+    WHERE
+        history_owners.name_key = :name_key
+        AND ownership_intervals.valid_from BETWEEN :start_month AND :end_month
+        AND ownership_intervals.valid_from > :first_month
+    UNION ALL
+    SELECT
+        'disposed' AS change,
+        ownership_intervals.valid_to AS month,
+        history_titles.title_number,
+        history_titles.address
+    FROM
+        history_owners
+    JOIN
+        ownership_intervals ON ownership_intervals.owner_key = history_owners.owner_key
+    JOIN
+        history_titles ON history_titles.title_key = ownership_intervals.title_key
+    WHERE
+        history_owners.name_key = :name_key
+        AND ownership_intervals.valid_to BETWEEN :start_month AND :end_month
+    ORDER BY
+        month,
+        title_number
+    """
+    parameters = {"name_key": get_owner_key(owner), "start_month": start_month,
+                  "end_month": end_month, "first_month": first_month}
+    try:
+        cursor.execute(query, parameters)
+        result = cursor.fetchall()
+    except sqlite3.OperationalError:
+        # Recorded before owners had lookup keys
+        return None
+    finally:
+        cursor.close()
+
+    return [{"change": change, "month": format_month(month), "title_number": title_number, "address": address}
+            for change, month, title_number, address in result]
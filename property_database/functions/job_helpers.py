@@ -0,0 +1,145 @@
+import copy
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from constants import JOBS_TO_KEEP
+
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_futures = {}
+_jobs_lock = threading.Lock()
+
+# A single worker runs jobs one after another. Downloads share the temp
+# directory, so they must never run at the same time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been asked to stop."""
+
+
+def submit_job(description, run, *args):
+    """Queue `run(job, *args)` to run in the background and return the job's ID."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "description": description,
+        "status": "queued",
+        "stage": None,
+        "stages": {},
+        "progress": {},
+        "error": None,
+        "cancel_requested": False,
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None
+    }
+
+    with _jobs_lock:
+        _jobs[job["id"]] = job
+        prune_jobs()
+        _futures[job["id"]] = _executor.submit(run_job, job, run, args)
+
+    return job["id"]
+
+
+def run_job(job, run, args):
+    """Run a job, recording how it ended."""
+    with _jobs_lock:
+        if job["cancel_requested"]:
+            job["status"] = "cancelled"
+            job["finished_at"] = time.time()
+            return
+        job["status"] = "running"
+        job["started_at"] = time.time()
+
+    try:
+        run(job, *args)
+        status, error = "succeeded", None
+    except JobCancelled:
+        status, error = "cancelled", None
+    except Exception as e:
+        logger.exception("Job %s failed", job["id"])
+        status, error = "failed", str(e)
+
+    with _jobs_lock:
+        end_stage(job)
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = time.time()
+
+
+def end_stage(job):
+    """Record how long the current stage took. Call with the lock held."""
+    stage = job["stages"].get(job["stage"])
+    if stage and stage["seconds"] is None:
+        stage["seconds"] = time.perf_counter() - stage["started"]
+
+
+def start_stage(job, stage):
+    """Move a job on to its next stage, stopping it instead if it has been cancelled."""
+    check_cancelled(job)
+    with _jobs_lock:
+        end_stage(job)
+        job["stage"] = stage
+        job["stages"][stage] = {"started": time.perf_counter(), "seconds": None}
+    logger.info("Job %s: %s", job["id"], stage)
+
+
+def update_progress(job, name, done, total):
+    """Record progress on part of a job, stopping it instead if it has been cancelled."""
+    check_cancelled(job)
+    with _jobs_lock:
+        job["progress"][name] = {"done": done, "total": total}
+
+
+def check_cancelled(job):
+    """Raise JobCancelled if the job has been asked to stop."""
+    if job["cancel_requested"]:
+        raise JobCancelled()
+
+
+def cancel_job(job_id):
+    """Ask a job to stop. Queued jobs never start; running ones stop at their next check.
+
+    Returns the job's status, or None if there is no such job.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job["status"] in ("queued", "running"):
+            job["cancel_requested"] = True
+            if _futures[job_id].cancel():
+                job["status"] = "cancelled"
+                job["finished_at"] = time.time()
+
+    return get_job(job_id)
+
+
+def get_job(job_id):
+    """Return a copy of a job's state, with running stages timed up to now, or None."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = copy.deepcopy(job)
+
+    # A list, as JSON objects lose the order the stages ran in
+    now = time.perf_counter()
+    job["stages"] = [{"stage": name, "seconds": round(now - stage["started"] if stage["seconds"] is None else stage["seconds"], 2)}
+                     for name, stage in job["stages"].items()]
+    return job
+
+
+def prune_jobs():
+    """Forget the oldest finished jobs beyond JOBS_TO_KEEP. Call with the lock held."""
+    finished = [job_id for job_id, job in _jobs.items()
+                if job["status"] in ("succeeded", "failed", "cancelled")]
+    for job_id in finished[:max(len(finished) - JOBS_TO_KEEP, 0)]:
+        del _jobs[job_id]
+        del _futures[job_id]
@@ -0,0 +1,33 @@
+import re
+
+
+MULTIPLE_SPACES_PATTERN = re.compile(r"\s{2,}")
+LTD_PATTERN = re.compile("LTD", flags=re.IGNORECASE)
+DISALLOWED_OWNER_CHARS_PATTERN = re.compile(
+    r"[^()A-Z0-9&@£$€¥#.,:; ]", flags=re.IGNORECASE)
+
+
+def clean_owner_data(owner):
+    """Clean the 'owner' column data.
+
+    Spaces are collapsed again after characters are removed, and "LTD" is
+    replaced last, so removing characters can never leave a double space or
+    a "LTD" behind. Cleaning a cleaned name therefore leaves it unchanged.
+    """
+    if not isinstance(owner, str):
+        return owner
+
+    # Remove extra spaces and make it uppercase
+    owner = MULTIPLE_SPACES_PATTERN.sub(" ", owner.strip()).upper()
+
+    # Remove unwanted characters, and the spaces they leave
+    owner = DISALLOWED_OWNER_CHARS_PATTERN.sub("", owner)
+    owner = MULTIPLE_SPACES_PATTERN.sub(" ", owner).strip()
+
+    # Replace "LTD" with "LIMITED" to minimise duplicates
+    return LTD_PATTERN.sub("LIMITED", owner)
+
+
+def get_owner_key(owner):
+    """Return the key an owner name is looked up by: its name as cleaned at ingest."""
+    return clean_owner_data(owner)
@@ -0,0 +1,238 @@
+import sqlite3
+import logging
+import threading
+import time
+from itertools import chain
+import numpy as np
+from functions.database_helpers import get_dataset_version, get_read_connection
+
+
+logger = logging.getLogger(__name__)
+
+# The co-ownership graph is stored in the snapshot as a few arrays, so it is
+# swapped in with the data it was built from. Owners are nodes, indexed by
+# owner_id, and two owners are joined if they hold a title together:
+#   offsets     owner_id -> start of the owner's entries in neighbours (CSR)
+#   neighbours  co-owner IDs, grouped by owner and in ID order
+#   weights     the number of titles held with each of those co-owners
+#   components  owner_id -> smallest owner_id in the owner's connected group
+#   groups      component -> start of its members in members (CSR)
+#   members     owner IDs grouped by component, most titles first
+#   title_counts owner_id -> number of titles held, for ranking
+GRAPH_SCHEMA = """
+CREATE TABLE owner_graph (
+    name TEXT PRIMARY KEY,
+    dtype TEXT,
+    data BLOB
+)
+"""
+
+_owner_graph = None
+_owner_graph_key = None
+_owner_graph_lock = threading.Lock()
+
+
+def read_links(conn):
+    """Return the title and owner IDs of every title/owner link, ordered by title."""
+    count = conn.execute("SELECT COUNT(*) FROM titles_owners").fetchone()[0]
+
+    # Packing both IDs into one integer halves the Python objects created
+    packed = np.fromiter(chain.from_iterable(conn.execute(
+        "SELECT (title_id << 32) | owner_id FROM titles_owners ORDER BY title_id, owner_id")),
+        dtype=np.int64, count=count)
+    return packed >> 32, packed & 0xFFFFFFFF
+
+
+def get_co_owner_pairs(title_ids, owner_ids):
+    """Return every ordered pair of distinct owners of the same title, and how many titles each pair shares."""
+    starts = np.flatnonzero(np.r_[True, title_ids[1:] != title_ids[:-1]])
+    sizes = np.diff(np.r_[starts, len(title_ids)])
+
+    # Titles have at most a handful of owners, so pairs are built for each
+    # number of owners in turn
+    pairs = [np.empty(0, dtype=np.int64)]
+    for size in range(2, sizes.max(initial=1) + 1):
+        group_starts = starts[sizes == size]
+        if not len(group_starts):
+            continue
+        owners = owner_ids[group_starts[:, None] + np.arange(size)]
+        first, second = np.nonzero(~np.eye(size, dtype=bool))
+        pairs.append((owners[:, first] << 32 | owners[:, second]).ravel())
+
+    pairs, weights = np.unique(np.concatenate(pairs), return_counts=True)
+    return pairs >> 32, pairs & 0xFFFFFFFF, weights
+
+
+def find_components(offsets, neighbours, node_count):
+    """Label each node with the smallest node ID in its connected component.
+
+    Labels are lowered to the smallest label among each node's neighbours,
+    then each label is pointed at its own label until nothing changes. This
+    takes a few passes over the edges rather than a search per node.
+    """
+    labels = np.arange(node_count, dtype=np.int64)
+    connected = np.flatnonzero(np.diff(offsets))
+    if not len(connected):
+        return labels
+
+    while True:
+        neighbour_labels = np.minimum.reduceat(
+            labels[neighbours], offsets[connected])
+        lowest = np.minimum(labels[connected], neighbour_labels)
+
+        # Lower each node's label, and the label's own node, so whole trees merge
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, labels[connected], lowest)
+        new_labels[connected] = np.minimum(new_labels[connected], lowest)
+        while True:
+            jumped = new_labels[new_labels]
+            if np.array_equal(jumped, new_labels):
+                break
+            new_labels = jumped
+
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def build_owner_graph(db_file):
+    """Build the co-ownership graph from a built database and store it in the database.
+
+    Returns the time taken in seconds.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    try:
+        node_count = conn.execute(
+            "SELECT COALESCE(MAX(owner_id), 0) + 1 FROM owners").fetchone()[0]
+        owners = np.fromiter(chain.from_iterable(conn.execute(
+            "SELECT (owner_id << 32) | COALESCE(title_count, 0) FROM owners")), dtype=np.int64)
+        title_counts = np.zeros(node_count, dtype=np.int32)
+        title_counts[owners >> 32] = owners & 0xFFFFFFFF
+
+        sources, neighbours, weights = get_co_owner_pairs(*read_links(conn))
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+
+        components = find_components(offsets, neighbours, node_count)
+        groups = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(components, minlength=node_count), out=groups[1:])
+        members = np.lexsort((np.arange(node_count), -title_counts, components))
+
+        arrays = {
+            "offsets": offsets,
+            "neighbours": neighbours.astype(np.int32),
+            "weights": weights.astype(np.int32),
+            "components": components.astype(np.int32),
+            "groups": groups,
+            "members": members.astype(np.int32),
+            "title_counts": title_counts
+        }
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS owner_graph")
+            conn.execute(GRAPH_SCHEMA)
+            conn.executemany("INSERT INTO owner_graph (name, dtype, data) VALUES (?, ?, ?)",
+                             [(name, array.dtype.str, array.tobytes()) for name, array in arrays.items()])
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    logger.info("Built the co-ownership graph of %d owners and %d links in %.2fs",
+                node_count - 1, len(neighbours) // 2, seconds)
+    return seconds
+
+
+def load_owner_graph(database):
+    """Read the co-ownership graph's arrays from a database, or None if it has none."""
+    cursor = get_read_connection(database).cursor()
+    try:
+        cursor.execute("SELECT name, dtype, data FROM owner_graph")
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        # Built before the graph existed
+        return None
+    finally:
+        cursor.close()
+
+    # The arrays are read-only views of the bytes read from the database
+    return {name: np.frombuffer(data, dtype=dtype) for name, dtype, data in rows}
+
+
+def get_owner_graph(database):
+    """Return the co-ownership graph, (re)loading it when a new database is served."""
+    global _owner_graph, _owner_graph_key
+
+    key = (database, get_dataset_version(database))
+    with _owner_graph_lock:
+        if _owner_graph_key != key:
+            _owner_graph = load_owner_graph(database)
+            _owner_graph_key = key
+        return _owner_graph
+
+
+def get_neighbours(graph, owner_ids):
+    """Return the co-owners of every given owner, concatenated, with the titles shared with each."""
+    starts = graph["offsets"][owner_ids]
+    lengths = graph["offsets"][owner_ids + 1] - starts
+
+    # Index every entry of every owner's range in a single gather
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths,
+                          lengths) + np.arange(lengths.sum())
+    return graph["neighbours"][positions], graph["weights"][positions]
+
+
+def is_owner(graph, owner_id):
+    """Return whether the owner ID is in the graph."""
+    return 0 < owner_id < len(graph["components"])
+
+
+def get_co_owners(graph, owner_id, limit):
+    """Return the number of co-owners of an owner and the `limit` sharing the most titles with it.
+
+    Co-owners are returned as (owner_id, shared_titles) pairs.
+    """
+    neighbours, weights = get_neighbours(graph, np.array([owner_id]))
+    order = np.lexsort((neighbours, -weights))[:limit]
+    return len(neighbours), list(zip(neighbours[order].tolist(), weights[order].tolist()))
+
+
+def rank_by_title_count(graph, owner_ids, limit):
+    """Return the `limit` owners holding the most titles, most first, then by ID."""
+    # One sort key, so ties at the limit are broken the same way as in the order
+    keys = owner_ids - (graph["title_counts"][owner_ids].astype(np.int64) << 32)
+    if len(keys) > limit:
+        keys = keys[np.argpartition(keys, limit - 1)[:limit]]
+
+    return (np.sort(keys) & 0xFFFFFFFF).tolist()
+
+
+def get_group(graph, owner_id, limit):
+    """Return the size of an owner's connected group of co-owners and its `limit` largest members."""
+    component = graph["components"][owner_id]
+    start, end = graph["groups"][component:component + 2]
+    return int(end - start), graph["members"][start:min(end, start + limit)].tolist()
+
+
+def get_network(graph, owner_id, hops, limit):
+    """Return the owners within `hops` co-ownership links of an owner.
+
+    Returns the number of owners first reached at each hop, and up to
+    `limit` of them as (owner_id, hop) pairs, nearest first and then
+    largest first.
+    """
+    hops_away = np.full(len(graph["components"]), -1, dtype=np.int8)
+    hops_away[owner_id] = 0
+    frontier = np.array([owner_id])
+    counts, owners = [], []
+
+    for hop in range(1, hops + 1):
+        neighbours, _ = get_neighbours(graph, frontier)
+        hops_away[neighbours[hops_away[neighbours] < 0]] = hop
+        frontier = np.flatnonzero(hops_away == hop)
+        counts.append(len(frontier))
+        if len(owners) < limit:
+            owners += [(found, hop) for found in rank_by_title_count(graph, frontier, limit - len(owners))]
+        if not len(frontier):
+            break
+
+    return counts, owners
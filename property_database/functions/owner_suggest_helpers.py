@@ -0,0 +1,105 @@
+import heapq
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from constants import OWNER_SUGGESTIONS_MAX_LIMIT, OWNER_SUGGESTIONS_RANKED_PREFIXES
+from functions.database_helpers import get_read_connection
+from functions.normalise_helpers import get_owner_key
+
+
+# Prefix ranges larger than this are ranked once and memoised, keeping the
+# OWNER_SUGGESTIONS_RANKED_PREFIXES most recently used
+RANKED_PREFIX_THRESHOLD = 256
+
+_owner_index = None
+_owner_index_key = None
+_owner_index_lock = threading.Lock()
+
+
+def load_owner_rows(database):
+    """Fetch every owner and its title count in sorted order."""
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        owner,
+        title_count
+    FROM
+        owners
+    ORDER BY
+        owner
+    """
+    cursor.execute(query)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+
+def build_owner_index(owner_rows):
+    """Build a sorted prefix index from (owner, title_count) rows."""
+    owner_rows = sorted(owner_rows, key=lambda row: row[0])
+    return {
+        "names": [row[0] for row in owner_rows],
+        "counts": [row[1] or 0 for row in owner_rows],
+        "ranked": OrderedDict(),
+        "ranked_lock": threading.Lock()
+    }
+
+
+def get_owner_index(database):
+    """Return the owner prefix index, (re)loading it when the database changes."""
+    global _owner_index, _owner_index_key
+
+    if not os.path.exists(database):
+        return None
+
+    stat = os.stat(database)
+    key = (database, stat.st_mtime_ns, stat.st_size)
+
+    with _owner_index_lock:
+        if _owner_index_key != key:
+            _owner_index = build_owner_index(load_owner_rows(database))
+            _owner_index_key = key
+        return _owner_index
+
+
+def rank_owner_range(owner_index, start, end, limit):
+    """Return the top owners in a slice of the index by title count, then name."""
+    names = owner_index["names"]
+    counts = owner_index["counts"]
+    top = heapq.nsmallest(limit, range(start, end),
+                          key=lambda i: (-counts[i], names[i]))
+    return [{"owner": names[i], "title_count": counts[i]} for i in top]
+
+
+def suggest_owners(owner_index, query, limit):
+    """Return up to `limit` owners whose name starts with the query."""
+    # Owners are stored under the key their searches look them up by
+    prefix = get_owner_key(query or "")
+    if not owner_index or not prefix:
+        return []
+
+    names = owner_index["names"]
+    start = bisect_left(names, prefix)
+    end = bisect_left(names, prefix + "\U0010ffff", lo=start)
+
+    # Small ranges are cheap to rank on every request
+    if end - start <= RANKED_PREFIX_THRESHOLD:
+        return rank_owner_range(owner_index, start, end, limit)
+
+    # Large ranges (short prefixes) are ranked once up to the maximum limit
+    ranked_prefixes = owner_index["ranked"]
+    with owner_index["ranked_lock"]:
+        ranked = ranked_prefixes.get(prefix)
+        if ranked is not None:
+            ranked_prefixes.move_to_end(prefix)
+
+    if ranked is None:
+        ranked = rank_owner_range(
+            owner_index, start, end, OWNER_SUGGESTIONS_MAX_LIMIT)
+        with owner_index["ranked_lock"]:
+            ranked_prefixes[prefix] = ranked
+            if len(ranked_prefixes) > OWNER_SUGGESTIONS_RANKED_PREFIXES:
+                ranked_prefixes.popitem(last=False)
+
+    return ranked[:limit]
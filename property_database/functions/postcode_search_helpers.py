@@ -0,0 +1,118 @@
+import re
+from functions.database_helpers import get_read_connection
+
+
+OUTWARD_CODE_PATTERN = re.compile(r"^[A-Z]{1,2}([0-9][A-Z0-9]?)?$")
+INWARD_CODE_PATTERN = re.compile(r"^([0-9][A-Z]{0,2})?$")
+FULL_POSTCODE_PATTERN = re.compile(r"^([A-Z]{1,2}[0-9][A-Z0-9]?)([0-9][A-Z]{2})$")
+
+
+def parse_postcode_prefix(text):
+    """Turn a full or partial postcode into the prefix stored postcodes start with, or None.
+
+    An outward code on its own matches every outward code starting with it,
+    so "SW1" finds SW1A and SW19 as well as SW1. An outward code followed by
+    part of an inward code ("SW1A 1") matches that outward code only.
+    """
+    text = " ".join(text.upper().split())
+
+    if " " in text:
+        outward, _, inward = text.partition(" ")
+    else:
+        # Without a space, only a complete postcode can be split unambiguously
+        match = FULL_POSTCODE_PATTERN.match(text)
+        outward, inward = match.groups() if match else (text, "")
+
+    if not outward or not OUTWARD_CODE_PATTERN.match(outward) or not INWARD_CODE_PATTERN.match(inward):
+        return None
+
+    return f"{outward} {inward}" if inward else outward
+
+
+def get_prefix_range(prefix):
+    """Return the bounds of the strings starting with a prefix, for an index range scan."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def count_postcode_titles(database, prefix):
+    """Count the titles whose postcode starts with the prefix."""
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        COUNT(*)
+    FROM
+        titles
+    WHERE
+        postcode >= ?
+        AND postcode < ?
+    """
+    cursor.execute(query, get_prefix_range(prefix))
+    result = cursor.fetchone()[0]
+    cursor.close()
+    return result
+
+
+def get_postcode_owners(database, prefix, limit):
+    """Fetch the owners holding the most titles whose postcode starts with the prefix."""
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        owners.owner,
+        owners.country,
+        owners.source,
+        COUNT(*) AS title_count
+    FROM
+        titles
+    JOIN
+        titles_owners ON titles_owners.title_id = titles.title_id
+    JOIN
+        owners ON owners.owner_id = titles_owners.owner_id
+    WHERE
+        titles.postcode >= ?
+        AND titles.postcode < ?
+    GROUP BY
+        owners.owner_id
+    ORDER BY
+        title_count DESC,
+        owners.owner
+    LIMIT ?
+    """
+    cursor.execute(query, (*get_prefix_range(prefix), limit))
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+
+def get_postcode_titles_page(database, prefix, after_postcode, after_title_id, limit):
+    """Fetch a page of the title numbers whose postcode starts with the prefix.
+
+    Titles are ordered by postcode and then title ID, the order of the
+    postcode index, and the page starts after the given postcode and title
+    ID. Returns the title numbers and the (postcode, title_id) to continue
+    from, or None if this is the last page.
+    """
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        postcode,
+        title_id,
+        title_number
+    FROM
+        titles
+    WHERE
+        postcode >= ?
+        AND postcode < ?
+        AND (postcode, title_id) > (?, ?)
+    ORDER BY
+        postcode,
+        title_id
+    LIMIT ?
+    """
+    # One extra row is fetched to find out whether there is another page
+    cursor.execute(query, (*get_prefix_range(prefix),
+                   after_postcode, after_title_id, limit + 1))
+    result = cursor.fetchall()
+    cursor.close()
+
+    next_after = tuple(result[limit - 1][:2]) if len(result) > limit else None
+    return [row[2] for row in result[:limit]], next_after
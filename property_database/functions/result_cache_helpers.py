@@ -0,0 +1,103 @@
+import sys
+import threading
+from collections import OrderedDict
+from constants import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+from functions.database_helpers import get_dataset_version
+
+
+# Results of recent searches, least recently used first. Every entry belongs
+# to the dataset version in _results_version; a new version empties the cache
+_results = OrderedDict()
+_results_bytes = 0
+_results_version = None
+_results_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_results_lock = threading.Lock()
+
+
+def estimate_size(value):
+    """Estimate the memory held by a result made of lists, tuples, dicts and scalars."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item)
+                    for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+def get_cached_result(key, version):
+    """Return (True, result) for a cached result, or (False, None), and count the lookup."""
+    global _results_bytes, _results_version
+
+    with _results_lock:
+        if version != _results_version:
+            _results_stats["invalidations"] += len(_results)
+            _results.clear()
+            _results_bytes = 0
+            _results_version = version
+
+        entry = _results.get(key)
+        if entry is None:
+            _results_stats["misses"] += 1
+            return False, None
+
+        _results.move_to_end(key)
+        _results_stats["hits"] += 1
+        return True, entry[0]
+
+
+def store_result(key, version, result):
+    """Cache a result, evicting the least recently used ones to stay within the limits."""
+    global _results_bytes
+
+    size = estimate_size(result)
+    if size > RESULT_CACHE_MAX_BYTES:
+        return
+
+    with _results_lock:
+        # The dataset changed while the result was being worked out
+        if version != _results_version:
+            return
+
+        previous = _results.pop(key, None)
+        if previous:
+            _results_bytes -= previous[1]
+
+        _results[key] = (result, size)
+        _results_bytes += size
+
+        while len(_results) > RESULT_CACHE_MAX_ENTRIES or _results_bytes > RESULT_CACHE_MAX_BYTES:
+            _, (_, evicted_size) = _results.popitem(last=False)
+            _results_bytes -= evicted_size
+            _results_stats["evictions"] += 1
+
+
+def cached_result(database, search_type, query, compute):
+    """Return `compute()`, reusing its result for the same search of the same dataset version.
+
+    `query` must already be normalised, so that equivalent searches share
+    an entry. Results are kept until they are evicted or the database is
+    replaced.
+    """
+    key = (search_type, query)
+    version = get_dataset_version(database)
+
+    found, result = get_cached_result(key, version)
+    if not found:
+        result = compute()
+        store_result(key, version, result)
+
+    return result
+
+
+def get_result_cache_stats():
+    """Return the cache's hit, miss and eviction counts and its current size."""
+    with _results_lock:
+        return {
+            **_results_stats,
+            "entries": len(_results),
+            "bytes": _results_bytes,
+            "max_entries": RESULT_CACHE_MAX_ENTRIES,
+            "max_bytes": RESULT_CACHE_MAX_BYTES,
+            "dataset_version": _results_version
+        }
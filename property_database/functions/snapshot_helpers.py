@@ -0,0 +1,129 @@
+import os
+import shutil
+import sqlite3
+import logging
+from datetime import datetime
+from constants import DATABASE, SNAPSHOT_DIRECTORY, SNAPSHOTS_TO_KEEP
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "titles_owners_"
+
+
+def create_snapshot_path(snapshot_directory=SNAPSHOT_DIRECTORY):
+    """Return the path of a new snapshot, named after the time it was started."""
+    os.makedirs(snapshot_directory, exist_ok=True)
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    return os.path.join(snapshot_directory, f"{SNAPSHOT_PREFIX}{version}.db")
+
+
+def list_snapshots(snapshot_directory=SNAPSHOT_DIRECTORY):
+    """Return the paths of every snapshot, oldest first."""
+    if not os.path.isdir(snapshot_directory):
+        return []
+
+    return sorted(os.path.join(snapshot_directory, name) for name in os.listdir(snapshot_directory)
+                  if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".db"))
+
+
+def is_live_snapshot(snapshot_path, database=DATABASE):
+    """Return whether the snapshot is the database being served."""
+    try:
+        return os.path.samefile(snapshot_path, database)
+    except FileNotFoundError:
+        return False
+
+
+def copy_database(source, destination):
+    """Copy a database with the backup API, so the copy is consistent even while it is read."""
+    source_conn = sqlite3.connect(source)
+    destination_conn = sqlite3.connect(destination)
+    try:
+        source_conn.backup(destination_conn)
+    finally:
+        destination_conn.close()
+        source_conn.close()
+
+
+def stamp_snapshot(snapshot_path):
+    """Record the snapshot's version inside it, so cached results can be matched to it."""
+    version = os.path.basename(snapshot_path)[len(SNAPSHOT_PREFIX):-len(".db")]
+    conn = sqlite3.connect(snapshot_path)
+    try:
+        with conn:
+            # A Change Only update starts from a copy of the live stamp
+            conn.execute("DROP TABLE IF EXISTS dataset_version")
+            conn.execute("CREATE TABLE dataset_version (version TEXT)")
+            conn.execute(
+                "INSERT INTO dataset_version (version) VALUES (?)", (version,))
+    finally:
+        conn.close()
+
+
+def validate_snapshot(snapshot_path):
+    """Gather query planner statistics for a snapshot and check it can be served.
+
+    Raises ValueError if the snapshot is corrupt or has no titles.
+    """
+    conn = sqlite3.connect(snapshot_path)
+    try:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        if problems != ["ok"]:
+            raise ValueError(
+                f"Error: The new database failed its integrity check: {problems[0]}")
+
+        if conn.execute("SELECT 1 FROM titles LIMIT 1").fetchone() is None:
+            raise ValueError("Error: The new database has no titles")
+    finally:
+        conn.close()
+
+
+def activate_snapshot(snapshot_path, database=DATABASE):
+    """Make a snapshot the live database in a single rename.
+
+    The live path becomes a hard link to the snapshot (or a copy where links
+    are not supported). Readers with the old database open carry on using
+    it, and reopen the new one on their next request.
+    """
+    os.makedirs(os.path.dirname(database), exist_ok=True)
+    swap_path = f"{database}.swap"
+    if os.path.exists(swap_path):
+        os.remove(swap_path)
+
+    try:
+        os.link(snapshot_path, swap_path)
+    except OSError:
+        shutil.copyfile(snapshot_path, swap_path)
+
+    os.replace(swap_path, database)
+    logger.info("Serving %s", os.path.basename(snapshot_path))
+
+
+def prune_snapshots(keep=SNAPSHOTS_TO_KEEP, snapshot_directory=SNAPSHOT_DIRECTORY, database=DATABASE):
+    """Delete all but the newest `keep` snapshots, never the live one."""
+    snapshots = list_snapshots(snapshot_directory)
+    for snapshot_path in snapshots[:max(len(snapshots) - keep, 0)]:
+        if is_live_snapshot(snapshot_path, database):
+            continue
+        try:
+            os.remove(snapshot_path)
+        except OSError:
+            # Still open elsewhere on platforms that lock open files
+            logger.warning("Could not remove %s", snapshot_path)
+
+
+def rollback_snapshot(snapshot_directory=SNAPSHOT_DIRECTORY, database=DATABASE):
+    """Serve the snapshot before the live one. Returns its path, or None if there is none."""
+    snapshots = list_snapshots(snapshot_directory)
+    live = [i for i, snapshot_path in enumerate(snapshots)
+            if is_live_snapshot(snapshot_path, database)]
+    if not live or live[0] == 0:
+        return None
+
+    previous_snapshot = snapshots[live[0] - 1]
+    activate_snapshot(previous_snapshot, database)
+    return previous_snapshot
@@ -0,0 +1,301 @@
+import sqlite3
+import logging
+import time
+import numpy as np
+import pandas as pd
+from functions.database_helpers import get_read_connection
+from functions.owner_graph_helpers import read_links
+
+
+logger = logging.getLogger(__name__)
+
+# Summary tables built once at ingest, so statistics never scan the links.
+# A title counts once towards each country and source among its owners,
+# however many of its owners share them. NULL countries are kept as they
+# are: CCOD owners have none
+STATISTICS_SCHEMAS = {
+    "owner_stats": """
+    CREATE TABLE owner_stats (
+        owner_id INTEGER PRIMARY KEY,
+        title_count INTEGER,
+        priced_title_count INTEGER,
+        total_price REAL
+    )
+    """,
+    "country_stats": """
+    CREATE TABLE country_stats (
+        country TEXT,
+        source TEXT,
+        owner_count INTEGER,
+        title_count INTEGER,
+        total_price REAL
+    )
+    """,
+    "source_stats": """
+    CREATE TABLE source_stats (
+        source TEXT,
+        owner_count INTEGER,
+        title_count INTEGER,
+        total_price REAL
+    )
+    """
+}
+
+# For the top owners by titles and by price
+STATISTICS_INDEXES = [
+    "CREATE INDEX idx_owner_stats_title_count ON owner_stats (title_count)",
+    "CREATE INDEX idx_owner_stats_total_price ON owner_stats (total_price)"
+]
+
+# Keep the summary tables current as Change Only updates add and remove
+# owners and links. Titles are only ever added before their links and
+# removed after them, so a link's title price can always be read
+STATISTICS_TRIGGERS = {
+    "statistics_owner_insert": """
+    CREATE TRIGGER statistics_owner_insert AFTER INSERT ON owners BEGIN
+        INSERT INTO owner_stats (owner_id, title_count, priced_title_count, total_price)
+        VALUES (new.owner_id, 0, 0, 0);
+        INSERT INTO country_stats (country, source, owner_count, title_count, total_price)
+        SELECT new.country, new.source, 0, 0, 0
+        WHERE NOT EXISTS (SELECT 1 FROM country_stats WHERE country IS new.country AND source IS new.source);
+        UPDATE country_stats SET owner_count = owner_count + 1
+        WHERE country IS new.country AND source IS new.source;
+        INSERT INTO source_stats (source, owner_count, title_count, total_price)
+        SELECT new.source, 0, 0, 0
+        WHERE NOT EXISTS (SELECT 1 FROM source_stats WHERE source IS new.source);
+        UPDATE source_stats SET owner_count = owner_count + 1
+        WHERE source IS new.source;
+    END
+    """,
+    "statistics_owner_delete": """
+    CREATE TRIGGER statistics_owner_delete AFTER DELETE ON owners BEGIN
+        DELETE FROM owner_stats WHERE owner_id = old.owner_id;
+        UPDATE country_stats SET owner_count = owner_count - 1
+        WHERE country IS old.country AND source IS old.source;
+        UPDATE source_stats SET owner_count = owner_count - 1
+        WHERE source IS old.source;
+    END
+    """,
+    "statistics_link_insert": """
+    CREATE TRIGGER statistics_link_insert AFTER INSERT ON titles_owners BEGIN
+        UPDATE owner_stats SET
+            title_count = title_count + 1,
+            priced_title_count = priced_title_count + (SELECT price IS NOT NULL FROM titles WHERE title_id = new.title_id),
+            total_price = total_price + (SELECT COALESCE(price, 0) FROM titles WHERE title_id = new.title_id)
+        WHERE owner_id = new.owner_id;
+        UPDATE country_stats SET
+            title_count = title_count + 1,
+            total_price = total_price + (SELECT COALESCE(price, 0) FROM titles WHERE title_id = new.title_id)
+        WHERE (country, source) IS (SELECT country, source FROM owners WHERE owner_id = new.owner_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM titles_owners JOIN owners ON owners.owner_id = titles_owners.owner_id
+                WHERE titles_owners.title_id = new.title_id AND titles_owners.owner_id != new.owner_id
+                    AND owners.country IS country_stats.country AND owners.source IS country_stats.source);
+        UPDATE source_stats SET
+            title_count = title_count + 1,
+            total_price = total_price + (SELECT COALESCE(price, 0) FROM titles WHERE title_id = new.title_id)
+        WHERE source IS (SELECT source FROM owners WHERE owner_id = new.owner_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM titles_owners JOIN owners ON owners.owner_id = titles_owners.owner_id
+                WHERE titles_owners.title_id = new.title_id AND titles_owners.owner_id != new.owner_id
+                    AND owners.source IS source_stats.source);
+    END
+    """,
+    "statistics_link_delete": """
+    CREATE TRIGGER statistics_link_delete AFTER DELETE ON titles_owners BEGIN
+        UPDATE owner_stats SET
+            title_count = title_count - 1,
+            priced_title_count = priced_title_count - (SELECT price IS NOT NULL FROM titles WHERE title_id = old.title_id),
+            total_price = total_price - (SELECT COALESCE(price, 0) FROM titles WHERE title_id = old.title_id)
+        WHERE owner_id = old.owner_id;
+        UPDATE country_stats SET
+            title_count = title_count - 1,
+            total_price = total_price - (SELECT COALESCE(price, 0) FROM titles WHERE title_id = old.title_id)
+        WHERE (country, source) IS (SELECT country, source FROM owners WHERE owner_id = old.owner_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM titles_owners JOIN owners ON owners.owner_id = titles_owners.owner_id
+                WHERE titles_owners.title_id = old.title_id
+                    AND owners.country IS country_stats.country AND owners.source IS country_stats.source);
+        UPDATE source_stats SET
+            title_count = title_count - 1,
+            total_price = total_price - (SELECT COALESCE(price, 0) FROM titles WHERE title_id = old.title_id)
+        WHERE source IS (SELECT source FROM owners WHERE owner_id = old.owner_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM titles_owners JOIN owners ON owners.owner_id = titles_owners.owner_id
+                WHERE titles_owners.title_id = old.title_id
+                    AND owners.source IS source_stats.source);
+    END
+    """
+}
+
+
+def summarise_groups(owners, keys, owner_ids, title_ids, prices):
+    """Count the owners, distinct titles and total title price of each group of owners sharing `keys`.
+
+    `owner_ids` and `title_ids` are the links, and `prices` is indexed by title ID.
+    """
+    groups = owners.groupby(keys, dropna=False)
+    summary = groups.size().rename("owner_count").reset_index()
+
+    codes = np.zeros(owners["owner_id"].max() + 1, dtype=np.int64)
+    codes[owners["owner_id"].to_numpy()] = groups.ngroup().to_numpy()
+
+    # A title held by several owners in the same group is counted once.
+    # Links come ordered by title, so sorting them is cheap
+    holdings = np.sort(title_ids << 32 | codes[owner_ids], kind="stable")
+    holdings = holdings[np.r_[True, holdings[1:] != holdings[:-1]]]
+    holding_titles, holding_codes = holdings >> 32, holdings & 0xFFFFFFFF
+    summary["title_count"] = np.bincount(holding_codes, minlength=len(summary))
+    summary["total_price"] = np.bincount(holding_codes, weights=np.nan_to_num(prices[holding_titles]),
+                                         minlength=len(summary))
+    return summary
+
+
+def insert_rows(conn, table_name, df):
+    """Insert a summary table's rows, storing missing values as NULL."""
+    df = df.astype(object).where(df.notna(), None)
+    placeholders = ", ".join("?" for _ in df.columns)
+    conn.executemany(f"INSERT INTO {table_name} ({', '.join(df.columns)}) VALUES ({placeholders})",
+                     df.itertuples(index=False, name=None))
+
+
+def create_statistics(conn):
+    """Build the summary tables from scratch, with the triggers that keep them current.
+
+    Runs on the caller's connection and does not commit.
+    """
+    for trigger_name in STATISTICS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+    for table_name, schema in STATISTICS_SCHEMAS.items():
+        conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        conn.execute(schema)
+    for statement in STATISTICS_INDEXES + list(STATISTICS_TRIGGERS.values()):
+        conn.execute(statement)
+
+    owners = pd.read_sql_query(
+        "SELECT owner_id, country, source FROM owners", conn)
+    if owners.empty:
+        return
+    titles = pd.read_sql_query("SELECT title_id, price FROM titles", conn)
+    title_ids, owner_ids = read_links(conn)
+
+    # Arrays indexed by ID stand in for joining millions of links
+    prices = np.full(titles["title_id"].max() + 1, np.nan)
+    prices[titles["title_id"].to_numpy()] = titles["price"].to_numpy(dtype=float)
+    link_prices = prices[title_ids]
+    priced = ~np.isnan(link_prices)
+
+    size = owners["owner_id"].max() + 1
+    present = owners["owner_id"].to_numpy()
+    owner_stats = pd.DataFrame({
+        "owner_id": present,
+        "title_count": np.bincount(owner_ids, minlength=size)[present],
+        "priced_title_count": np.bincount(owner_ids[priced], minlength=size)[present],
+        "total_price": np.bincount(owner_ids[priced], weights=link_prices[priced], minlength=size)[present]
+    })
+
+    insert_rows(conn, "owner_stats", owner_stats)
+    insert_rows(conn, "country_stats", summarise_groups(
+        owners, ["country", "source"], owner_ids, title_ids, prices))
+    insert_rows(conn, "source_stats", summarise_groups(
+        owners, ["source"], owner_ids, title_ids, prices))
+
+
+def build_statistics(db_file):
+    """Build the summary tables of a built database. Returns the time taken in seconds."""
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    try:
+        with conn:
+            create_statistics(conn)
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    logger.info("Built the summary statistics in %.2fs", seconds)
+    return seconds
+
+
+def add_statistics(conn):
+    """Build the summary tables of a database built before they existed."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'owner_stats'").fetchone()
+    if row is None:
+        create_statistics(conn)
+
+
+def get_source_stats(database):
+    """Fetch the owner and title counts and total price of each dataset, or None if not built."""
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        source,
+        owner_count,
+        title_count,
+        total_price
+    FROM
+        source_stats
+    ORDER BY
+        source
+    """
+    try:
+        cursor.execute(query)
+        return cursor.fetchall()
+    except sqlite3.OperationalError:
+        # Built before the summary tables existed
+        return None
+    finally:
+        cursor.close()
+
+
+def get_country_stats(database):
+    """Fetch the owner and title counts and total price of each country of incorporation, most titles first."""
+    cursor = get_read_connection(database).cursor()
+    query = """
+    SELECT
+        country,
+        source,
+        owner_count,
+        title_count,
+        total_price
+    FROM
+        country_stats
+    WHERE
+        owner_count > 0
+    ORDER BY
+        title_count DESC
+    """
+    cursor.execute(query)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+
+def get_top_owners(database, order_by, limit):
+    """Fetch the owners with the most titles or the highest total price paid.
+
+    `order_by` is "title_count" or "total_price".
+    """
+    if order_by not in ("title_count", "total_price"):
+        raise ValueError(f"Cannot rank owners by {order_by}")
+
+    cursor = get_read_connection(database).cursor()
+    query = f"""
+    SELECT
+        owners.owner,
+        owners.country,
+        owners.source,
+        owner_stats.title_count,
+        owner_stats.priced_title_count,
+        owner_stats.total_price
+    FROM
+        owner_stats
+        JOIN owners ON owners.owner_id = owner_stats.owner_id
+    ORDER BY
+        owner_stats.{order_by} DESC
+    LIMIT ?
+    """
+    cursor.execute(query, (limit,))
+    result = cursor.fetchall()
+    cursor.close()
+    return result
@@ -1,9 +1,10 @@
-import sqlite3
+from constants import BULK_LOOKUP_CHUNK_SIZE
+from functions.bulk_search_helpers import read_column_values
+from functions.database_helpers import get_read_connection
 
 
 def get_title_info(database, title_number):
-    conn = sqlite3.connect(database)
-    cursor = conn.cursor()
+    cursor = get_read_connection(database).cursor()
     query = """
     SELECT
         address,
@@ -15,7 +16,7 @@ def get_title_info(database, title_number):
     """
     cursor.execute(query, (title_number,))
     result = cursor.fetchall()
-    conn.close()
+    cursor.close()
     return result
 
 
@@ -29,8 +30,7 @@ def format_title_info(title_number, raw_title_details):
 
 
 def get_owners_for_title_number(database, title_number):
-    conn = sqlite3.connect(database)
-    cursor = conn.cursor()
+    cursor = get_read_connection(database).cursor()
     query = """
     SELECT
         owners.owner,
@@ -40,23 +40,82 @@ def get_owners_for_title_number(database, title_number):
         owners
     JOIN
         titles_owners ON owners.owner_id = titles_owners.owner_id
+    JOIN
+        titles ON titles.title_id = titles_owners.title_id
     WHERE
-        titles_owners.title_id = (
-            SELECT title_id FROM titles WHERE title_number = ?
-        );
+        titles.title_number = ?
     """
     cursor.execute(query, (title_number,))
     result = cursor.fetchall()
-    conn.close()
+    cursor.close()
     return result
 
+
 def get_owners_from_raw_owner_info(raw_owner_info):
-    owners = [{"company": owner[0], "country": owner[1],
+    owners = [{"company": owner[0], "country": format_owner_country(owner[1], owner[2]),
                 "source": owner[2]} for owner in raw_owner_info]
-    for owner in owners:
-        if owner["country"] is None and owner["source"] == "CCOD":
-            owner["country"] = "UK"
-        elif owner["country"] is None and owner["source"] == "OCOD":
-            owner["country"] = "No data"
 
     return owners
+
+
+def format_owner_country(country, source):
+    """Fill in a missing country: CCOD owners are UK companies."""
+    if country is None and source == "CCOD":
+        return "UK"
+    elif country is None and source == "OCOD":
+        return "No data"
+
+    return country
+
+
+def parse_title_numbers(text):
+    """Read unique title numbers from pasted text or an uploaded CSV."""
+    title_numbers = read_column_values(text, ["TITLE NUMBER"])
+    return list(dict.fromkeys(title_number.upper() for title_number in title_numbers))
+
+
+def get_titles_with_owners(database, title_numbers):
+    """Yield every requested title with its owners, querying a chunk of titles at a time."""
+    cursor = get_read_connection(database).cursor()
+    try:
+        for start in range(0, len(title_numbers), BULK_LOOKUP_CHUNK_SIZE):
+            batch = title_numbers[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            query = f"""
+            SELECT
+                titles.title_number,
+                titles.address,
+                titles.price,
+                owners.owner,
+                owners.country,
+                owners.source
+            FROM
+                titles
+            LEFT JOIN
+                titles_owners ON titles_owners.title_id = titles.title_id
+            LEFT JOIN
+                owners ON owners.owner_id = titles_owners.owner_id
+            WHERE
+                titles.title_number IN ({placeholders})
+            """
+            cursor.execute(query, batch)
+
+            found = {}
+            for title_number, address, price, owner, country, source in cursor.fetchall():
+                title = found.setdefault(
+                    title_number, {"address": address, "price": price, "raw_owners": []})
+                if owner is not None:
+                    title["raw_owners"].append((owner, country, source))
+
+            # Return titles in the order they were requested, including misses
+            for title_number in batch:
+                title = found.get(title_number)
+                yield {
+                    "title_number": title_number,
+                    "found": title is not None,
+                    "address": title["address"] if title else None,
+                    "price": title["price"] if title else None,
+                    "owners": get_owners_from_raw_owner_info(title["raw_owners"]) if title else []
+                }
+    finally:
+        cursor.close()
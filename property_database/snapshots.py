@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+from constants import DATABASE, SNAPSHOT_DIRECTORY
+from functions.snapshot_helpers import list_snapshots, is_live_snapshot, activate_snapshot, rollback_snapshot
+
+
+def show_snapshots(args):
+    for snapshot_path in list_snapshots(args.snapshot_directory):
+        marker = "*" if is_live_snapshot(snapshot_path, args.database) else " "
+        print(f"{marker} {os.path.basename(snapshot_path)}")
+
+
+def activate(args):
+    snapshot_path = os.path.join(args.snapshot_directory, args.snapshot)
+    if snapshot_path not in list_snapshots(args.snapshot_directory):
+        sys.exit(f"No snapshot named {args.snapshot}")
+
+    activate_snapshot(snapshot_path, args.database)
+    print(f"Serving {args.snapshot}")
+
+
+def rollback(args):
+    snapshot_path = rollback_snapshot(args.snapshot_directory, args.database)
+    if snapshot_path is None:
+        sys.exit("There is no earlier snapshot to roll back to")
+
+    print(f"Serving {os.path.basename(snapshot_path)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List database snapshots or change which one is served.")
+    parser.add_argument("--database", default=DATABASE,
+                        help="Path to the live titles/owners database")
+    parser.add_argument("--snapshot-directory", default=SNAPSHOT_DIRECTORY,
+                        help="Directory holding the snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser(
+        "list", help="List snapshots, oldest first. The live one is marked *")
+    list_parser.set_defaults(handler=show_snapshots)
+
+    activate_parser = subparsers.add_parser(
+        "activate", help="Serve a snapshot")
+    activate_parser.add_argument("snapshot", help="File name of the snapshot")
+    activate_parser.set_defaults(handler=activate)
+
+    rollback_parser = subparsers.add_parser(
+        "rollback", help="Serve the snapshot before the live one")
+    rollback_parser.set_defaults(handler=rollback)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its modules relative to property_database, as when it is run
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
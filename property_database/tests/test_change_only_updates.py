@@ -0,0 +1,139 @@
+import shutil
+import sqlite3
+import pandas as pd
+import pytest
+from constants import DATASETS_COLUMNS, DTYPE_DICT
+from functions.download_dataset_helpers import apply_change_only_updates, build_database, create_search_indexes, load_data
+from functions.statistics_helpers import build_statistics
+
+
+FULL_RELEASE = {
+    "ocod": [
+        {"Title Number": "T1", "Property Address": "1 High Street, London (SW1A 1AA)", "Price Paid": 100000,
+         "Proprietor Name (1)": "Alpha Ltd", "Country Incorporated (1)": "JERSEY",
+         "Proprietor Name (2)": "Beta Ltd", "Country Incorporated (2)": "GUERNSEY"},
+        {"Title Number": "T2", "Property Address": "2 High Street, London (SW1A 1AB)", "Price Paid": 200000,
+         "Proprietor Name (1)": "Alpha Ltd", "Country Incorporated (1)": "JERSEY"},
+        {"Title Number": "T3", "Property Address": "3 Low Road, Leeds (LS1 1AA)", "Price Paid": 300000,
+         "Proprietor Name (1)": "Gamma Ltd", "Country Incorporated (1)": "PANAMA"}
+    ],
+    "ccod": [
+        {"Title Number": "C1", "Property Address": "1 Mill Lane, York (YO1 1AA)", "Price Paid": 50000,
+         "Proprietor Name (1)": "Delta Limited"},
+        {"Title Number": "C2", "Property Address": "2 Mill Lane, York (YO1 1AB)",
+         "Proprietor Name (1)": "Delta Limited", "Proprietor Name (2)": "Epsilon PLC"}
+    ]
+}
+
+# T3 and C2 are deleted, T1 changes hands and T4 and C3 are new
+CHANGES = {
+    "ocod": [
+        {"Title Number": "T3", "Change Indicator": "D"},
+        {"Title Number": "T1", "Change Indicator": "M", "Property Address": "1 High Street, London (SW1A 1AA)",
+         "Price Paid": 150000,
+         "Proprietor Name (1)": "Beta Ltd", "Country Incorporated (1)": "GUERNSEY",
+         "Proprietor Name (2)": "Zeta  ltd", "Country Incorporated (2)": "MALTA"},
+        {"Title Number": "T4", "Change Indicator": "A", "Property Address": "4 High Street, London (SW1A 1AD)",
+         "Price Paid": 400000,
+         "Proprietor Name (1)": "Alpha Ltd", "Country Incorporated (1)": "JERSEY"}
+    ],
+    "ccod": [
+        {"Title Number": "C2", "Change Indicator": "D"},
+        {"Title Number": "C3", "Change Indicator": "A", "Property Address": "3 Mill Lane, York (YO1 1AD)",
+         "Price Paid": 75000, "Proprietor Name (1)": "Delta ltd"}
+    ]
+}
+
+
+def write_dataset(path, rows, columns):
+    pd.DataFrame(rows).reindex(columns=columns).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def updated_database(tmp_path):
+    """Build a database from the full release, then apply the Change Only files to it."""
+    db_file = str(tmp_path / "database.db")
+    datasets = {dataset: load_data(write_dataset(tmp_path / f"{dataset}_full.csv", rows, DATASETS_COLUMNS[dataset]),
+                                   DATASETS_COLUMNS[dataset], DTYPE_DICT, dataset.upper())
+                for dataset, rows in FULL_RELEASE.items()}
+    build_database(db_file, "latest", [], datasets)
+
+    files = [(write_dataset(tmp_path / f"{dataset}_changes.csv", rows, DATASETS_COLUMNS[dataset] + ["Change Indicator"]),
+              DATASETS_COLUMNS[dataset], dataset.upper())
+             for dataset, rows in CHANGES.items()]
+    apply_change_only_updates(files, db_file)
+    return db_file
+
+
+def query(db_file, sql, parameters=()):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(sql, parameters).fetchall()
+    finally:
+        conn.close()
+
+
+def get_owners_of(db_file, title_number):
+    return sorted(owner for (owner,) in query(db_file, """
+    SELECT owners.owner
+    FROM titles
+    JOIN titles_owners ON titles_owners.title_id = titles.title_id
+    JOIN owners ON owners.owner_id = titles_owners.owner_id
+    WHERE titles.title_number = ?
+    """, (title_number,)))
+
+
+def test_deleted_titles_are_removed_with_their_links(updated_database):
+    assert query(updated_database, "SELECT * FROM titles WHERE title_number IN ('T3', 'C2')") == []
+    assert query(updated_database,
+                 "SELECT * FROM titles_owners WHERE title_id NOT IN (SELECT title_id FROM titles)") == []
+
+
+def test_modified_title_replaces_its_owners_and_keeps_its_id(updated_database):
+    assert query(updated_database, "SELECT title_id, price FROM titles WHERE title_number = 'T1'") == [(1, 150000)]
+    assert get_owners_of(updated_database, "T1") == ["BETA LIMITED", "ZETA LIMITED"]
+
+
+def test_added_titles_are_inserted(updated_database):
+    assert query(updated_database, "SELECT title_id, address, price, postcode FROM titles WHERE title_number = 'T4'") == [
+        (6, "4 HIGH STREET, LONDON (SW1A 1AD)", 400000, "SW1A 1AD")]
+    assert get_owners_of(updated_database, "T4") == ["ALPHA LIMITED"]
+    assert get_owners_of(updated_database, "C3") == ["DELTA LIMITED"]
+
+
+def test_new_owners_are_added_with_their_country_and_source(updated_database):
+    assert query(updated_database, "SELECT owner_key, country, source FROM owners WHERE owner = 'ZETA LIMITED'") == [
+        ("ZETA LIMITED", "MALTA", "OCOD")]
+
+
+def test_title_counts_are_updated(updated_database):
+    assert dict(query(updated_database, "SELECT owner, title_count FROM owners")) == {
+        "ALPHA LIMITED": 2, "BETA LIMITED": 1, "ZETA LIMITED": 1, "DELTA LIMITED": 2}
+    assert query(updated_database, """
+    SELECT owner_id FROM owners
+    WHERE title_count != (SELECT COUNT(*) FROM titles_owners WHERE titles_owners.owner_id = owners.owner_id)
+    """) == []
+
+
+def test_owners_left_without_titles_are_deleted(updated_database):
+    assert query(updated_database, "SELECT owner FROM owners WHERE owner IN ('GAMMA LIMITED', 'EPSILON PLC')") == []
+
+
+def test_statistics_and_search_indexes_match_a_rebuild(updated_database, tmp_path):
+    rebuilt = str(tmp_path / "rebuilt.db")
+    shutil.copy(updated_database, rebuilt)
+    build_statistics(rebuilt)
+    create_search_indexes(rebuilt)
+
+    for sql in ["SELECT * FROM owner_stats ORDER BY owner_id",
+                "SELECT * FROM country_stats WHERE owner_count > 0 ORDER BY country, source",
+                "SELECT * FROM source_stats WHERE owner_count > 0 ORDER BY source"]:
+        assert query(updated_database, sql) == query(rebuilt, sql)
+
+    for table_name in ("owners_fts", "titles_fts"):
+        query(updated_database, f"INSERT INTO {table_name} ({table_name}) VALUES ('integrity-check')")
+        vocab = f"SELECT term, doc, col, offset FROM {table_name}_vocab ORDER BY term, doc, offset"
+        for db_file in (updated_database, rebuilt):
+            query(db_file, f"CREATE VIRTUAL TABLE {table_name}_vocab USING fts5vocab({table_name}, instance)")
+        assert query(updated_database, vocab) == query(rebuilt, vocab)
@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+from constants import DATASETS_COLUMNS
+from functions import download_dataset_helpers
+from functions.download_dataset_helpers import download_datasets, get_zip_path, validate_inputs
+
+
+API_KEY = "abcd1234-abcd-abcd-abcd-abcdef123456"
+
+# The slow file is sent a chunk at a time, for far longer than a test should take
+SLOW_CHUNKS = 500
+SLOW_CHUNK_SECONDS = 0.02
+
+
+def make_zip(dataset):
+    """Zip a one-row CSV of a dataset, named as the releases name theirs."""
+    rows = pd.DataFrame([{"Title Number": f"{dataset.upper()}1", "Property Address": "1 High Street, London (SW1A 1AA)",
+                          "Proprietor Name (1)": "Acme Ltd"}]).reindex(columns=DATASETS_COLUMNS[dataset])
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr(f"{dataset.upper()}_FULL_2024_01.csv", rows.to_csv(index=False))
+    return archive.getvalue()
+
+
+class LandRegistryStandIn(BaseHTTPRequestHandler):
+    """Serves the dataset API, and each dataset's zip as the server is told to."""
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.strip("/").split("/")
+
+        if parts[0] == "files":
+            dataset = parts[1].split(".")[0]
+            behaviour = server.behaviours.get(dataset, "ok")
+            if behaviour == "fail":
+                # Fail once the other download is under way
+                time.sleep(0.2)
+                self.send_error(500)
+                return
+
+            body = make_zip(dataset)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            if behaviour == "slow":
+                self.send_header("Content-Length", str(SLOW_CHUNKS * 1024))
+                self.end_headers()
+                try:
+                    for _ in range(SLOW_CHUNKS):
+                        self.wfile.write(b"\0" * 1024)
+                        self.wfile.flush()
+                        time.sleep(SLOW_CHUNK_SECONDS)
+                    server.finished.add(dataset)
+                except OSError:
+                    pass
+                return
+
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            server.finished.add(dataset)
+            return
+
+        if len(parts) == 1:
+            result = {"resources": [{"name": "Full File", "file_name": f"{parts[0].upper()}_FULL_2024_01.zip"}]}
+        else:
+            result = {"download_url": f"{server.base_url}/files/{parts[0]}.zip"}
+        body = json.dumps({"result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def land_registry(tmp_path, monkeypatch):
+    """Point the downloads at a local stand-in for the Land Registry API."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LandRegistryStandIn)
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.behaviours = {}
+    server.finished = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(download_dataset_helpers, "LAND_REGISTRY_API_URL", server.base_url)
+    monkeypatch.setattr(download_dataset_helpers, "TEMP_DIRECTORY", str(tmp_path / "temp"))
+    monkeypatch.setattr(download_dataset_helpers, "STREAMING_INGEST", False)
+    monkeypatch.setattr(download_dataset_helpers, "DOWNLOAD_CHUNK_SIZE", 1024)
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_datasets_are_downloaded_in_parallel_and_parsed(land_registry):
+    progress = []
+    error, datasets = download_datasets(API_KEY, "latest", None, None,
+                                        lambda dataset, downloaded, total: progress.append(dataset))
+
+    assert error is None
+    assert land_registry.finished == set(DATASETS_COLUMNS)
+    assert {dataset: df["Title Number"].tolist() for dataset, df in datasets.items()} == {
+        dataset: [f"{dataset.upper()}1"] for dataset in DATASETS_COLUMNS}
+    assert set(progress) == set(DATASETS_COLUMNS)
+
+
+def test_a_failed_download_stops_the_other_one(land_registry):
+    land_registry.behaviours = {"ocod": "fail", "ccod": "slow"}
+
+    started = time.perf_counter()
+    error, datasets = download_datasets(API_KEY, "latest", None, None)
+    seconds = time.perf_counter() - started
+
+    assert error.startswith("Download error") and datasets == {}
+    # The slow download was abandoned long before it could finish
+    assert seconds < SLOW_CHUNKS * SLOW_CHUNK_SECONDS / 2
+    assert "ccod" not in land_registry.finished
+    assert not any(os.path.exists(get_zip_path(dataset)) for dataset in DATASETS_COLUMNS)
+
+
+@pytest.mark.parametrize("download_option", [None, "", "full", "LATEST"])
+def test_unknown_download_options_are_rejected(download_option):
+    assert validate_inputs(
+        API_KEY, download_option, None, None, None) == "Error: Invalid download option"
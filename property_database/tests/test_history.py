@@ -0,0 +1,71 @@
+import sqlite3
+import pandas as pd
+import pytest
+from functions.download_dataset_helpers import save_tables
+from functions.normalise_helpers import get_owner_key
+from functions.history_helpers import get_owner_changes, record_release
+
+
+# Title numbers held by each owner in each release
+RELEASES = {
+    202401: {"ACME 1 LIMITED": ["T1", "T2"], "BETA (UK) LIMITED": ["T3"]},
+    202402: {"ACME 1 LIMITED": ["T2", "T4"], "BETA (UK) LIMITED": ["T3"]}
+}
+
+
+def build_snapshot(db_file, holdings):
+    owners = list(holdings)
+    title_numbers = sorted({title_number for held in holdings.values() for title_number in held})
+    title_ids = {title_number: title_id for title_id, title_number in enumerate(title_numbers, start=1)}
+    save_tables({
+        "titles": pd.DataFrame({
+            "title_id": list(title_ids.values()),
+            "title_number": title_numbers,
+            "address": [f"{title_number} HIGH STREET" for title_number in title_numbers],
+            "price": None,
+            "postcode": None
+        }),
+        "owners": pd.DataFrame({
+            "owner_id": range(1, len(owners) + 1),
+            "owner": owners,
+            "owner_key": [get_owner_key(owner) for owner in owners],
+            "country": None,
+            "source": "CCOD",
+            "title_count": [len(holdings[owner]) for owner in owners]
+        }),
+        "titles_owners": pd.DataFrame(
+            [(owner_id, title_ids[title_number])
+             for owner_id, owner in enumerate(owners, start=1) for title_number in holdings[owner]],
+            columns=["owner_id", "title_id"])
+    }, str(db_file))
+    return str(db_file)
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    history_db = str(tmp_path / "history.db")
+    for month, holdings in RELEASES.items():
+        record_release(build_snapshot(tmp_path / f"{month}.db", holdings), month, history_db)
+    return history_db
+
+
+@pytest.mark.parametrize("owner", ["ACME 1 LIMITED", "acme 1 ltd", "'Acme'  1 Ltd"])
+def test_owner_changes_match_the_owner_key(history_db, owner):
+    assert get_owner_changes(owner, 202401, 202402, history_db) == [
+        {"change": "disposed", "month": "2024-02", "title_number": "T1", "address": "T1 HIGH STREET"},
+        {"change": "acquired", "month": "2024-02", "title_number": "T4", "address": "T4 HIGH STREET"}
+    ]
+
+
+def test_history_recorded_before_owner_keys_is_given_them_when_a_release_is_recorded(history_db, tmp_path):
+    conn = sqlite3.connect(history_db)
+    conn.execute("DROP INDEX idx_history_owners_name_key")
+    conn.execute("ALTER TABLE history_owners DROP COLUMN name_key")
+    conn.commit()
+    conn.close()
+
+    # Searches do not change the history
+    assert get_owner_changes("acme 1 ltd", 202401, 202402, history_db) is None
+
+    record_release(build_snapshot(tmp_path / "202403.db", RELEASES[202402]), 202403, history_db)
+    assert [change["title_number"] for change in get_owner_changes("acme 1 ltd", 202401, 202403, history_db)] == ["T1", "T4"]
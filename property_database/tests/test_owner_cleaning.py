@@ -0,0 +1,41 @@
+import random
+import numpy as np
+import pandas as pd
+from functions.download_dataset_helpers import clean_owner_columns
+from functions.normalise_helpers import clean_owner_data, get_owner_key
+
+
+OWNER_COLUMNS = [f"Proprietor Name ({i})" for i in range(1, 5)]
+
+# Letters, the "LTD" the cleaner rewrites, whitespace runs, allowed
+# punctuation and characters the cleaner removes
+FRAGMENTS = ["A", "b", "Z", "7", "LTD", "ltd", "Ltd", "L T D", " ", "  ", "\t", "\n",
+             "&", "@", "£", "€", "(", ")", ".", ",", ";", "'", "-", "/", "é", "ß", "ı", "!"]
+
+
+def random_owner(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 12)))
+
+
+def test_clean_owner_columns_matches_per_cell_cleaning():
+    rng = random.Random(0)
+    names = [random_owner(rng) for _ in range(500)]
+    # Missing names are read from the CSVs as NaN
+    cells = [rng.choice(names) if rng.random() < 0.8 else rng.choice([np.nan, 3.5])
+             for _ in range(len(OWNER_COLUMNS) * 2000)]
+    df = pd.DataFrame(np.array(cells, dtype=object).reshape(-1, len(OWNER_COLUMNS)),
+                      columns=OWNER_COLUMNS)
+
+    expected = {column: df[column].apply(clean_owner_data) for column in OWNER_COLUMNS}
+    cleaned = clean_owner_columns(df.copy())
+
+    for column in OWNER_COLUMNS:
+        pd.testing.assert_series_equal(cleaned[column], expected[column])
+
+
+def test_cleaned_names_are_their_own_owner_keys():
+    rng = random.Random(1)
+    for name in (random_owner(rng) for _ in range(2000)):
+        cleaned = clean_owner_data(name)
+        assert get_owner_key(name) == cleaned
+        assert clean_owner_data(cleaned) == cleaned
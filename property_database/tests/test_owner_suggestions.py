@@ -0,0 +1,28 @@
+from functions import owner_suggest_helpers
+from functions.normalise_helpers import get_owner_key
+from functions.owner_suggest_helpers import build_owner_index, suggest_owners
+
+
+def build_index(count):
+    # Enough owners under each two-letter prefix to be ranked and memoised
+    names = [get_owner_key(f"{first}{second} Holdings {i} Ltd")
+             for first in "AB" for second in "AB" for i in range(count)]
+    return build_owner_index([(name, i % 7) for i, name in enumerate(names)])
+
+
+def test_suggestions_match_names_by_their_owner_key():
+    owner_index = build_index(10)
+    assert [suggestion["owner"] for suggestion in suggest_owners(owner_index, "ab  holdings 3 l*td", 5)] == [
+        "AB HOLDINGS 3 LIMITED"]
+
+
+def test_ranked_prefixes_keep_only_the_most_recently_used(monkeypatch):
+    monkeypatch.setattr(owner_suggest_helpers, "RANKED_PREFIX_THRESHOLD", 5)
+    monkeypatch.setattr(owner_suggest_helpers, "OWNER_SUGGESTIONS_RANKED_PREFIXES", 2)
+    owner_index = build_index(10)
+
+    for prefix in ["AA", "AB", "AA", "BA"]:
+        suggest_owners(owner_index, prefix, 3)
+
+    assert list(owner_index["ranked"]) == ["AA", "BA"]
+    assert suggest_owners(owner_index, "ab", 3) == suggest_owners(build_index(10), "AB", 3)
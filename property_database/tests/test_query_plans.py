@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+from functions.company_search_helpers import get_company_info, get_owner_id, get_owner_summary, get_titles_page
+from functions.database_helpers import get_read_connection
+from functions.download_dataset_helpers import create_search_indexes, save_tables
+from functions.normalise_helpers import get_owner_key
+from functions.postcode_search_helpers import count_postcode_titles, get_postcode_owners, get_postcode_titles_page
+from functions.title_search_helpers import get_owners_for_title_number, get_title_info
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    """Build a small database the way a download does."""
+    db_file = str(tmp_path_factory.mktemp("database") / "database.db")
+    owners = ["ACME LIMITED", "BETA HOLDINGS LIMITED", "GAMMA PLC"]
+    titles = pd.DataFrame({
+        "title_id": range(1, 7),
+        "title_number": [f"TN{i}" for i in range(1, 7)],
+        "address": [f"{i} HIGH STREET, LONDON (SW1A {i}AA)" for i in range(1, 7)],
+        "price": [100000.0, None, 250000.0, 300000.0, None, 50000.0],
+        "postcode": [f"SW1A {i}AA" for i in range(1, 7)]
+    })
+    titles_owners = pd.DataFrame({"owner_id": [1, 1, 1, 2, 2, 3, 3],
+                                  "title_id": [1, 2, 3, 3, 4, 5, 6]})
+    save_tables({
+        "titles": titles,
+        "owners": pd.DataFrame({
+            "owner_id": range(1, 4),
+            "owner": owners,
+            "owner_key": [get_owner_key(owner) for owner in owners],
+            "country": ["JERSEY", None, "PANAMA"],
+            "source": ["OCOD", "CCOD", "OCOD"],
+            "title_count": titles_owners["owner_id"].value_counts().sort_index().tolist()
+        }),
+        "titles_owners": titles_owners
+    }, db_file)
+    create_search_indexes(db_file)
+    return db_file
+
+
+def get_query_plans(database, search, *args):
+    """Run a search and return the query plan steps of each statement it ran."""
+    conn = get_read_connection(database)
+    statements = []
+    # Statements are traced with their parameters filled in
+    conn.set_trace_callback(statements.append)
+    try:
+        result = search(database, *args)
+        if hasattr(result, "__next__"):
+            list(result)
+    finally:
+        conn.set_trace_callback(None)
+
+    assert statements
+    return [[row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+            for statement in statements]
+
+
+def assert_no_table_scans(plans):
+    for plan in plans:
+        for step in plan:
+            assert not step.startswith(("SCAN titles", "SCAN owners", "SCAN titles_owners")), plan
+
+
+@pytest.mark.parametrize("search", [get_owner_id, get_owner_summary, get_company_info])
+def test_owner_lookup_searches_the_owner_key_index(database, search):
+    plans = get_query_plans(database, search, "Acme Ltd")
+    assert_no_table_scans(plans)
+    assert any("idx_owners_owner_key (owner_key=?)" in step for step in plans[0])
+
+
+def test_titles_page_searches_the_titles_owners_primary_key(database):
+    plans = get_query_plans(database, get_titles_page, "Acme Ltd", 1, 10)
+    assert_no_table_scans(plans)
+    assert "SEARCH titles_owners USING PRIMARY KEY (owner_id=? AND title_id>?)" in plans[0]
+    assert any("idx_owners_owner_key (owner_key=?)" in step for step in plans[0])
+    assert "SEARCH titles USING INTEGER PRIMARY KEY (rowid=?)" in plans[0]
+
+
+@pytest.mark.parametrize("search", [get_title_info, get_owners_for_title_number])
+def test_title_lookup_searches_the_title_number_index(database, search):
+    plans = get_query_plans(database, search, "TN3")
+    assert_no_table_scans(plans)
+    assert any("idx_titles_title_number (title_number=?)" in step for step in plans[0])
+
+
+def test_title_owners_are_found_through_the_title_owner_index(database):
+    plans = get_query_plans(database, get_owners_for_title_number, "TN3")
+    assert any("idx_titles_owners_title_owner (title_id=?)" in step for step in plans[0])
+    assert "SEARCH owners USING INTEGER PRIMARY KEY (rowid=?)" in plans[0]
+
+
+@pytest.mark.parametrize("search, args", [
+    (count_postcode_titles, ("SW1A",)),
+    (get_postcode_owners, ("SW1A", 10)),
+    (get_postcode_titles_page, ("SW1A", "", 0, 10))
+])
+def test_postcode_queries_search_a_range_of_the_postcode_index(database, search, args):
+    plans = get_query_plans(database, search, *args)
+    assert_no_table_scans(plans)
+    assert any("idx_titles_postcode (postcode>? AND postcode<?)" in step for step in plans[0])
@@ -0,0 +1,77 @@
+import sqlite3
+import pandas as pd
+import pytest
+from constants import DATASETS_COLUMNS, DTYPE_DICT
+from functions import download_dataset_helpers
+from functions.download_dataset_helpers import build_database, load_data, stream_data_processing
+
+
+# Owners recur across chunks, one is listed twice on a title, and CCOD has
+# no countries
+RELEASE = {
+    "ocod": [
+        {"Title Number": "T1", "Property Address": "1 High Street, London (SW1A 1AA)", "Price Paid": 100000,
+         "Proprietor Name (1)": "Alpha Ltd", "Country Incorporated (1)": "JERSEY",
+         "Proprietor Name (2)": "Beta Ltd", "Country Incorporated (2)": "GUERNSEY"},
+        {"Title Number": "T2", "Property Address": "2 High Street, London (SW1A 1AB)",
+         "Proprietor Name (1)": "Beta  ltd", "Country Incorporated (1)": "GUERNSEY"},
+        {"Title Number": "T3", "Property Address": "3 Low Road, Leeds (LS1 1AA)", "Price Paid": 300000,
+         "Proprietor Name (1)": "Gamma Ltd", "Country Incorporated (1)": "PANAMA",
+         "Proprietor Name (2)": "Gamma LTD", "Country Incorporated (2)": "PANAMA"},
+        {"Title Number": "T4", "Property Address": "4 Low Road, Leeds (LS1 1AB)", "Price Paid": 400000,
+         "Proprietor Name (1)": "alpha ltd", "Country Incorporated (1)": "JERSEY"}
+    ],
+    "ccod": [
+        {"Title Number": "C1", "Property Address": "1 Mill Lane, York (YO1 1AA)", "Price Paid": 50000,
+         "Proprietor Name (1)": "Delta Limited"},
+        {"Title Number": "C2", "Property Address": "2 Mill Lane, York (YO1 1AB)",
+         "Proprietor Name (1)": "Delta Limited", "Proprietor Name (2)": "Epsilon PLC"},
+        {"Title Number": "C3", "Property Address": "3 Mill Lane, York (YO1 1AD)",
+         "Proprietor Name (1)": "Epsilon PLC"}
+    ]
+}
+
+
+def query(db_file, sql):
+    conn = sqlite3.connect(db_file)
+    try:
+        return sorted(conn.execute(sql).fetchall())
+    finally:
+        conn.close()
+
+
+def write_dataset(path, rows, columns):
+    pd.DataFrame(rows).reindex(columns=columns).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [(write_dataset(tmp_path / f"{dataset}.csv", rows, DATASETS_COLUMNS[dataset]), DATASETS_COLUMNS[dataset], dataset.upper())
+            for dataset, rows in RELEASE.items()]
+
+
+def test_streamed_database_matches_the_in_memory_build(files, tmp_path, monkeypatch):
+    built = str(tmp_path / "built" / "database.db")
+    build_database(built, "latest", [], {source.lower(): load_data(file_path, columns, DTYPE_DICT, source)
+                                        for file_path, columns, source in files})
+
+    # Two rows a chunk, so owners are deduplicated across chunks
+    monkeypatch.setattr(download_dataset_helpers, "INGEST_PROBE_ROWS", 2)
+    streamed = str(tmp_path / "streamed" / "database.db")
+    titles_written = []
+    stream_data_processing(files, streamed, memory_limit_mb=0, progress=titles_written.append)
+    assert titles_written == [2, 4, 6, 7]
+
+    for sql in ["SELECT title_number, address, price, postcode FROM titles",
+                "SELECT owner, owner_key, country, source, title_count FROM owners",
+                """
+                SELECT titles.title_number, owners.owner
+                FROM titles_owners
+                JOIN titles ON titles.title_id = titles_owners.title_id
+                JOIN owners ON owners.owner_id = titles_owners.owner_id
+                """]:
+        assert query(streamed, sql) == query(built, sql)
+
+    assert query(streamed, "SELECT owner_id, owner FROM owners") == [
+        (1, "ALPHA LIMITED"), (2, "BETA LIMITED"), (3, "GAMMA LIMITED"), (4, "DELTA LIMITED"), (5, "EPSILON PLC")]